@@ -61,11 +61,52 @@ class ContextObject:
         return self._profile
 
 
+class ArchiveImportThresholdClickType(ParamType):
+    name = 'ARCHIVE_IMPORT_THRESHOLD'
+    help = 'The number of new notebooks beneath a new remote directory above which the ' \
+           'directory is imported whole as a single archive. 0 disables archive imports. ' \
+           'Default: 100'
+
+
+class BulkExportClickType(ParamType):
+    name = 'BULK_EXPORT'
+    help = 'Export whole remote directories in a single request when checking notebooks for ' \
+           'changes, instead of exporting each notebook on its own.'
+
+
+class CompareWorkersClickType(ParamType):
+    name = 'COMPARE_WORKERS'
+    help = 'The maximum number of notebooks to export and compare concurrently. Default: 8'
+
+
 class DiffClickType(ParamType):
     name = 'DIFF'
     help = 'Display the difference between two files.'
 
 
+class DiffEngineClickType(ParamType):
+    name = 'DIFF_ENGINE'
+    help = 'The algorithm used to diff notebooks for --diff. Default: patience'
+
+
+class DiffMaxLinesClickType(ParamType):
+    name = 'DIFF_MAX_LINES'
+    help = 'The maximum number of lines of difference to report for each notebook or job. ' \
+           'Default: 1000'
+
+
+class DiffOutputClickType(ParamType):
+    name = 'DIFF_OUTPUT'
+    help = 'Where to report the differences shown by --diff: the log, a text file or a JSON ' \
+           'file. Default: log'
+
+
+class DiffPathClickType(ParamType):
+    name = 'DIFF_PATH'
+    help = 'The file that --diff-output=file|json writes to. ' \
+           'Default: .pipeline-deploy/diff.txt or .pipeline-deploy/diff.json'
+
+
 class DryRunType(ParamType):
     name = 'DRY_RUN'
     help = "Dry Run Mode. Shows full changes but doesn't actually execute."
@@ -86,6 +127,17 @@ class GroupNameClickType(ParamType):
     help = 'The name of group to be given management permissions for all created tasks.'
 
 
+class HashIndexClickType(ParamType):
+    name = 'HASH_INDEX'
+    help = 'Keep the manifest of deployed notebooks in a hidden file beneath the remote path, ' \
+           'shared by every machine deploying there. Takes precedence over --manifest.'
+
+
+class ImportConcurrencyClickType(ParamType):
+    name = 'IMPORT_CONCURRENCY'
+    help = 'The maximum number of notebooks to import concurrently. Default: 4'
+
+
 class IncludeJobsClickType(ParamType):
     name = 'INCLUDE_JOBS'
     help = 'A wildcard filter of jobs to include by job name.'
@@ -96,11 +148,50 @@ class IncludeNotebooksClickType(ParamType):
     help = 'A wildcard filter of notebooks to include by notebook path.'
 
 
+class InventoryTtlClickType(ParamType):
+    name = 'INVENTORY_TTL'
+    help = 'The number of seconds a locally cached inventory of the remote notebooks and jobs ' \
+           'may be reused before it is rebuilt. Default: 0 (disabled)'
+
+
+class JobConcurrencyClickType(ParamType):
+    name = 'JOB_CONCURRENCY'
+    help = 'The maximum number of jobs to create, reset or delete concurrently. Default: 4'
+
+
+class JobHashTagClickType(ParamType):
+    name = 'JOB_HASH_TAG'
+    help = 'Tag created and reset jobs with a fingerprint of their settings, so that later ' \
+           'deployments can recognise unchanged jobs without comparing their settings.'
+
+
+class JobsApiVersionClickType(ParamType):
+    name = 'JOBS_API_VERSION'
+    help = 'The version of the Jobs API to use. Default: the jobs-api-version of the profile, ' \
+           'otherwise 2.0'
+
+
 class JobsDirClickType(ParamType):
     name = 'JOBS_DIR'
     help = 'Directory containing JSON configuration files.'
 
 
+class ListConcurrencyClickType(ParamType):
+    name = 'LIST_CONCURRENCY'
+    help = 'The maximum number of remote directories to list concurrently. Default: 8'
+
+
+class ManifestClickType(ParamType):
+    name = 'MANIFEST'
+    help = 'Keep a local manifest of the deployed notebooks so that notebooks unchanged on ' \
+           'both sides since the last deployment are not downloaded for comparison.'
+
+
+class NoCacheClickType(ParamType):
+    name = 'NO_CACHE'
+    help = 'Do not read or write the local cache of notebook digests.'
+
+
 class NotebooksDirClickType(ParamType):
     name = 'NOTEBOOKS_DIR'
     help = 'Directory containing notebook files.'
@@ -116,6 +207,11 @@ class PrefixClickType(ParamType):
     help = 'A prefix to add to all job names.'
 
 
+class RefreshInventoryClickType(ParamType):
+    name = 'REFRESH_INVENTORY'
+    help = 'Ignore any locally cached inventory and rebuild it from the remote environment.'
+
+
 class RemotePathClickType(ParamType):
     name = 'REMOTE_PATH'
     help = 'The target path where all notebooks will be imported. Default: /'
@@ -124,4 +220,11 @@ class RemotePathClickType(ParamType):
 class SkipRestartClickType(ParamType):
     name = 'SKIP_RESTART'
     help = 'Skip streaming job restarts. If a dependency has changed for a streaming job, the ' \
-           'job will not be restarted.'
\ No newline at end of file
+           'job will not be restarted.'
+
+
+class TrustCreatorClickType(ParamType):
+    name = 'TRUST_CREATOR'
+    help = 'Treat the creator of each remote job as its owner when filtering by --owner, ' \
+           'skipping the permission lookups. Only use this when job ownership is never ' \
+           'transferred after creation.'
\ No newline at end of file
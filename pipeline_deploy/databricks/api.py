@@ -0,0 +1,77 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import io
+import zipfile
+
+from base64 import b64decode, b64encode
+from typing import Dict
+
+from databricks_cli.workspace.api import WorkspaceApi, WorkspaceFileInfo
+
+
+class RemoteFileInfo(WorkspaceFileInfo):
+    """Keeps the modification timestamp that `WorkspaceFileInfo` discards."""
+
+    def __init__(self, path, object_type, object_id, language=None, modified_at=None,
+                 **kwargs) -> None:
+        super().__init__(path, object_type, object_id, language, **kwargs)
+
+        self.modified_at = modified_at
+
+
+class WorkspaceClient(WorkspaceApi):
+    def export_source(self, workspace_path, headers=None) -> str:
+        """Exports the source of the object at `workspace_path` without staging it on disk."""
+
+        response = self.client.export_workspace(workspace_path, 'SOURCE', headers=headers)
+
+        return b64decode(response['content']).decode('utf-8')
+
+    def get_status(self, workspace_path, headers=None):
+        return RemoteFileInfo.from_json(self.client.get_status(workspace_path, headers=headers))
+
+    def list_objects(self, workspace_path, headers=None):
+        response = self.client.list(workspace_path, headers=headers)
+
+        return [RemoteFileInfo.from_json(obj) for obj in response.get('objects', [])]
+
+    def import_archive(self, workspace_path, files: Dict[str, str], headers=None):
+        """Imports the local `files`, keyed by their path within the archive, as a new
+        directory at `workspace_path` with a single request.  The workspace infers the
+        language of each notebook from its extension."""
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, path in sorted(files.items()):
+                archive.write(path, name)
+
+        content = b64encode(buffer.getvalue()).decode('ascii')
+
+        # Directories can not be overwritten, so this is only used for new directories.
+        return self.client.import_workspace(workspace_path, 'SOURCE', None, content, False,
+                                            headers=headers)
+
+    def import_source(self, workspace_path, source: str, fmt='AUTO', language=None,
+                      is_overwrite=True, headers=None):
+        """Imports `source` to `workspace_path` without staging it on disk."""
+
+        content = b64encode(source.encode('utf-8')).decode('ascii')
+
+        return self.client.import_workspace(workspace_path, fmt, language, content,
+                                            is_overwrite, headers=headers)
@@ -0,0 +1,298 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+from time import time, time_ns
+from typing import Any, Dict, List
+
+import requests
+
+from databricks_cli.workspace.api import DIRECTORY, WorkspaceFileInfo
+from pipeline_deploy.databricks import utils
+from pipeline_deploy.databricks.api import RemoteFileInfo, WorkspaceClient
+
+CACHE_DIR = os.path.join('.pipeline-deploy', 'cache')
+REMOTE_INDEX_NAME = '.pipeline-deploy-index.json'
+
+
+def get_cache_key(*parts: Any) -> str:
+    return hashlib.sha256('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def get_remote_index_path(remote_path: str) -> str:
+    return remote_path.rstrip('/') + '/' + REMOTE_INDEX_NAME
+
+
+def read_json(path: str):
+    try:
+        with open(path, 'r') as src:
+            return json.load(src)
+    except (OSError, json.decoder.JSONDecodeError):
+        return None
+
+
+def write_json(path: str, data: Any):
+    """Writes to a temporary file first so that a concurrent or interrupted run never
+    sees a partially written cache entry."""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as dst:
+        json.dump(data, dst)
+
+    os.replace(temp_path, path)
+
+
+class DigestCache:
+    """Remembers the normalised digest of each local notebook against its modification time
+    and size, so that notebooks unchanged between runs are not read again.  Entries for
+    notebooks that no longer exist are dropped when the cache is saved."""
+
+    MIN_AGE_NS = 2 * 10 ** 9
+
+    def __init__(self, cache_dir: str = CACHE_DIR) -> None:
+        self.entries = {}
+        self.is_dirty = False
+        self.path = os.path.join(cache_dir, 'digests.json')
+        self.seen = set()
+
+    def get_digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        self.seen.add(key)
+
+        entry = self.entries.get(key)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+
+        digest = utils.get_notebook_digest(path)
+
+        # A file modified again within the same timestamp tick would look unchanged, so only
+        # remember digests of files that have been left alone for a little while.
+        if time_ns() - stat.st_mtime_ns > self.MIN_AGE_NS:
+            self.entries[key] = [stat.st_mtime_ns, stat.st_size, digest]
+            self.is_dirty = True
+
+        return digest
+
+    def load(self):
+        data = read_json(self.path)
+
+        if data and data.get('version') == utils.NORMALISER_VERSION:
+            self.entries = data['entries']
+
+    def save(self):
+        # Notebooks read during this run are known to exist, so only the others are checked.
+        missing = [key for key in self.entries if key not in self.seen and not os.path.exists(key)]
+
+        for key in missing:
+            del self.entries[key]
+
+        if self.is_dirty or missing:
+            write_json(self.path, {'version': utils.NORMALISER_VERSION, 'entries': self.entries})
+            self.is_dirty = False
+
+
+class Inventory:
+    """A snapshot of the remote paths and jobs that a deployment manages, persisted between
+    runs so that repeat deployments against the same workspace can skip listing it.  The
+    controllers write their changes through to the snapshot as they make them."""
+
+    VERSION = 1
+
+    def __init__(self, host: str, remote_path: str, filters: Dict[str, Any], ttl: int,
+                 cache_dir: str = CACHE_DIR) -> None:
+        self.filters = filters
+        self.path = os.path.join(cache_dir, 'inventory',
+                                 get_cache_key(host, remote_path) + '.json')
+        self.remote_path = remote_path
+        self.ttl = ttl
+
+        self.created_at = time()
+        self.jobs = {}
+        self.paths = {}
+
+    def add_path(self, path: str, object_type: str, language: str = None):
+        self.paths[path] = RemoteFileInfo(path, object_type, None, language)
+
+        # Creating an object also creates any of its missing parent directories.
+        root = self.remote_path.rstrip('/')
+        directory = os.path.dirname(path)
+
+        while directory.startswith(root + '/') and directory not in self.paths:
+            if utils.filter_notebooks(self.filters['exclude_notebooks'],
+                                      self.filters['include_notebooks'], directory):
+                self.paths[directory] = RemoteFileInfo(directory, DIRECTORY, None)
+
+            directory = os.path.dirname(directory)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def get_jobs(self) -> List[dict]:
+        return list(self.jobs.values())
+
+    def get_paths(self) -> List[WorkspaceFileInfo]:
+        return list(self.paths.values())
+
+    def load(self) -> bool:
+        data = read_json(self.path)
+
+        if not data or data.get('version') != self.VERSION or data.get('filters') != self.filters:
+            return False
+
+        if time() - data['created_at'] > self.ttl:
+            logging.debug('The remote inventory at %s has expired.', self.path)
+            return False
+
+        self.created_at = data['created_at']
+        self.jobs = {str(job['job_id']): job for job in data['jobs']}
+        self.paths = {obj['path']: RemoteFileInfo.from_json(obj) for obj in data['paths']}
+
+        return True
+
+    def remove_job(self, job_id: str):
+        self.jobs.pop(str(job_id), None)
+
+    def remove_path(self, path: str, is_recursive: bool = False):
+        self.paths.pop(path, None)
+
+        if is_recursive:
+            prefix = path.rstrip('/') + '/'
+            self.paths = {k: v for k, v in self.paths.items() if not k.startswith(prefix)}
+
+    def reset(self, paths: List[WorkspaceFileInfo], jobs: List[dict]):
+        self.created_at = time()
+        self.jobs = {str(job['job_id']): job for job in jobs}
+        self.paths = {str(obj.path): obj for obj in paths}
+
+    def save(self):
+        write_json(self.path, {
+            'version': self.VERSION,
+            'created_at': self.created_at,
+            'filters': self.filters,
+            'jobs': self.get_jobs(),
+            'paths': [{'path': obj.path, 'object_type': obj.object_type,
+                       'object_id': obj.object_id, 'language': obj.language,
+                       'modified_at': getattr(obj, 'modified_at', None)}
+                      for obj in self.paths.values()]
+        })
+
+    def set_job(self, job: dict):
+        self.jobs[str(job['job_id'])] = job
+
+    def set_path(self, obj: WorkspaceFileInfo):
+        self.paths[obj.path] = obj
+
+
+class Manifest:
+    """Records, for each remote notebook, the workspace metadata and the normalised content
+    digest it had when it was last known to match its local notebook.  A notebook whose
+    metadata and local digest both still match its entry can be skipped without exporting
+    it."""
+
+    VERSION = 1
+
+    def __init__(self, host: str, remote_path: str, cache_dir: str = CACHE_DIR) -> None:
+        self.entries = {}
+        self.path = os.path.join(cache_dir, 'manifest',
+                                 get_cache_key(host, remote_path) + '.json')
+
+    def is_unchanged(self, obj: WorkspaceFileInfo, digest: str) -> bool:
+        modified_at = getattr(obj, 'modified_at', None)
+
+        return modified_at is not None and self.entries.get(obj.path) == {
+            'object_id': obj.object_id,
+            'modified_at': modified_at,
+            'digest': digest
+        }
+
+    def load(self):
+        data = read_json(self.path)
+
+        if data and data.get('version') == self.VERSION:
+            self.entries = data['entries']
+
+    def record(self, obj: WorkspaceFileInfo, digest: str):
+        modified_at = getattr(obj, 'modified_at', None)
+
+        if modified_at is None:
+            self.entries.pop(obj.path, None)
+        else:
+            self.entries[obj.path] = {
+                'object_id': obj.object_id,
+                'modified_at': modified_at,
+                'digest': digest
+            }
+
+    def remove(self, path: str, is_recursive: bool = False):
+        self.entries.pop(path, None)
+
+        if is_recursive:
+            prefix = path.rstrip('/') + '/'
+            self.entries = {k: v for k, v in self.entries.items() if not k.startswith(prefix)}
+
+    def save(self):
+        write_json(self.path, {'version': self.VERSION, 'entries': self.entries})
+
+
+class RemoteManifest(Manifest):
+    """A `Manifest` kept as a single workspace file beneath the remote path, so that every
+    machine deploying to the workspace shares it.  Reading it is one request regardless of
+    how many notebooks it covers."""
+
+    def __init__(self, client: WorkspaceClient, remote_path: str) -> None:
+        super().__init__(None, remote_path)
+
+        self.client = client
+        self.path = get_remote_index_path(remote_path)
+        self.saved_entries = {}
+
+    def load(self):
+        try:
+            data = json.loads(self.client.export_source(self.path))
+        except requests.exceptions.HTTPError as ex:
+            if ex.response.json()['error_code'] == 'RESOURCE_DOES_NOT_EXIST':
+                logging.debug('No remote hash index exists at %s.', self.path)
+                return
+
+            raise
+        except json.decoder.JSONDecodeError:
+            logging.debug('Ignoring the unreadable remote hash index at %s.', self.path)
+            return
+
+        if data.get('version') == self.VERSION:
+            self.entries = data['entries']
+            self.saved_entries = dict(self.entries)
+
+    def save(self):
+        # Avoid rewriting the index, and bumping its own timestamp, when nothing changed.
+        if self.entries == self.saved_entries:
+            return
+
+        self.client.import_source(self.path, json.dumps({'version': self.VERSION,
+                                                         'entries': self.entries}))
+        self.saved_entries = dict(self.entries)
@@ -26,8 +26,13 @@ import click
 from databricks_cli.sdk.api_client import ApiClient
 from pipeline_deploy import click_types as types
 from pipeline_deploy.configure.config import debug_option, dry_run_option
+from pipeline_deploy.databricks.api import WorkspaceClient
+from pipeline_deploy.databricks.cache import DigestCache, Inventory, Manifest, RemoteManifest, \
+    get_remote_index_path
 from pipeline_deploy.databricks.configure.config import profile_option, provide_api_client
 from pipeline_deploy.databricks.controllers import JobsController, NotebooksController
+from pipeline_deploy.databricks.diff import DEFAULT_DIFF_ENGINE, DIFF_ENGINES
+from pipeline_deploy.databricks.report import DEFAULT_DIFF_MAX_LINES, DIFF_OUTPUTS, DiffReport
 from pipeline_deploy.databricks import utils
 from pipeline_deploy.utils import CONTEXT_SETTINGS, eat_exceptions
 
@@ -35,16 +40,62 @@ from pipeline_deploy.utils import CONTEXT_SETTINGS, eat_exceptions
 @click.command(context_settings=CONTEXT_SETTINGS,
                short_help='Deploy notebooks and jobs to Databricks.',
                no_args_is_help=True)
+@click.option('--archive-import-threshold',
+              default=utils.DEFAULT_ARCHIVE_IMPORT_THRESHOLD,
+              type=click.IntRange(min=0),
+              help=types.ArchiveImportThresholdClickType.help)
+@click.option('--bulk-export', is_flag=True, help=types.BulkExportClickType.help)
+@click.option('--compare-workers',
+              default=utils.DEFAULT_COMPARE_WORKERS,
+              type=click.IntRange(min=1),
+              help=types.CompareWorkersClickType.help)
 @click.option('--diff', is_flag=True, help=types.DiffClickType.help)
+@click.option('--diff-engine',
+              default=DEFAULT_DIFF_ENGINE,
+              type=click.Choice(sorted(DIFF_ENGINES)),
+              help=types.DiffEngineClickType.help)
+@click.option('--diff-max-lines',
+              default=DEFAULT_DIFF_MAX_LINES,
+              type=click.IntRange(min=0),
+              help=types.DiffMaxLinesClickType.help)
+@click.option('--diff-output',
+              default='log',
+              type=click.Choice(DIFF_OUTPUTS),
+              help=types.DiffOutputClickType.help)
+@click.option('--diff-path', default=None, help=types.DiffPathClickType.help)
 @click.option('--exclude-jobs', multiple=True, help=types.ExcludeJobsClickType.help)
 @click.option('--exclude-notebooks', multiple=True, help=types.ExcludeNotebooksClickType.help)
 @click.option('--group-name', default=None, help=types.GroupNameClickType.help)
+@click.option('--hash-index', is_flag=True, help=types.HashIndexClickType.help)
+@click.option('--import-concurrency',
+              default=utils.DEFAULT_IMPORT_CONCURRENCY,
+              type=click.IntRange(min=1),
+              help=types.ImportConcurrencyClickType.help)
 @click.option('--include-jobs', multiple=True, help=types.IncludeJobsClickType.help)
 @click.option('--include-notebooks', multiple=True, help=types.IncludeNotebooksClickType.help)
+@click.option('--inventory-ttl',
+              default=0,
+              type=click.IntRange(min=0),
+              help=types.InventoryTtlClickType.help)
+@click.option('--job-concurrency',
+              default=utils.DEFAULT_JOB_CONCURRENCY,
+              type=click.IntRange(min=1),
+              help=types.JobConcurrencyClickType.help)
+@click.option('--job-hash-tag', is_flag=True, help=types.JobHashTagClickType.help)
+@click.option('--jobs-api-version',
+              default=None,
+              type=click.Choice(utils.JOBS_API_VERSIONS),
+              help=types.JobsApiVersionClickType.help)
 @click.option('--jobs-dir',
               required=True,
               type=click.Path(exists=True, resolve_path=True, dir_okay=True),
               help=types.JobsDirClickType.help)
+@click.option('--list-concurrency',
+              default=utils.DEFAULT_LIST_CONCURRENCY,
+              type=click.IntRange(min=1),
+              help=types.ListConcurrencyClickType.help)
+@click.option('--manifest', is_flag=True, help=types.ManifestClickType.help)
+@click.option('--no-cache', is_flag=True, help=types.NoCacheClickType.help)
 @click.option('--notebooks-dir',
               required=True,
               type=click.Path(exists=True, resolve_path=True, dir_okay=True),
@@ -52,16 +103,25 @@ from pipeline_deploy.utils import CONTEXT_SETTINGS, eat_exceptions
 @click.option('--remote-path', default='/', help=types.RemotePathClickType.help)
 @click.option('--owner', help=types.OwnerClickType.help)
 @click.option('--prefix', help=types.PrefixClickType.help)
+@click.option('--refresh-inventory', is_flag=True, help=types.RefreshInventoryClickType.help)
 @click.option('--skip-restart', is_flag=True, help=types.SkipRestartClickType.help)
+@click.option('--trust-creator', is_flag=True, help=types.TrustCreatorClickType.help)
 @debug_option
 @dry_run_option
 @profile_option
 @provide_api_client
 @eat_exceptions
-def databricks_cli(api_client: ApiClient, diff: bool, dry_run: bool, exclude_jobs: Tuple[str],
-                   exclude_notebooks: Tuple[str], group_name: str, include_jobs: Tuple[str],
-                   include_notebooks: Tuple[str], jobs_dir: str, notebooks_dir: str, owner: str,
-                   prefix: str, remote_path: str, skip_restart: bool):
+def databricks_cli(api_client: ApiClient, archive_import_threshold: int, bulk_export: bool,
+                   compare_workers: int, diff: bool, diff_engine: str, diff_max_lines: int,
+                   diff_output: str, diff_path: str,
+                   dry_run: bool, exclude_jobs: Tuple[str], exclude_notebooks: Tuple[str],
+                   group_name: str, hash_index: bool, import_concurrency: int,
+                   include_jobs: Tuple[str],
+                   include_notebooks: Tuple[str], inventory_ttl: int, job_concurrency: int,
+                   job_hash_tag: bool, jobs_api_version: str,
+                   jobs_dir: str, list_concurrency: int, manifest: bool, no_cache: bool,
+                   notebooks_dir: str, owner: str, prefix: str, refresh_inventory: bool,
+                   remote_path: str, skip_restart: bool, trust_creator: bool):
     if isinstance(exclude_jobs, tuple):
         exclude_jobs_list = list(exclude_jobs)
     elif not isinstance(exclude_jobs, list):
@@ -81,15 +141,61 @@ def databricks_cli(api_client: ApiClient, diff: bool, dry_run: bool, exclude_job
 
     logging.info('Executing databricks deployment.')
     logging.debug('Parameters: %s',
-                  dict(diff=diff, dry_run=dry_run, exclude_jobs=exclude_jobs_list,
+                  dict(archive_import_threshold=archive_import_threshold,
+                       bulk_export=bulk_export, compare_workers=compare_workers, diff=diff,
+                       diff_engine=diff_engine, diff_max_lines=diff_max_lines,
+                       diff_output=diff_output, diff_path=diff_path, dry_run=dry_run,
+                       exclude_jobs=exclude_jobs_list,
                        exclude_notebooks=exclude_notebooks_list, group_name=group_name,
-                       include_jobs=include_jobs_list, include_notebooks=include_notebooks_list,
-                       jobs_dir=jobs_dir, notebooks_dir=notebooks_dir, owner=owner,
-                       prefix=prefix, remote_path=remote_path, skip_restart=skip_restart))
+                       hash_index=hash_index, import_concurrency=import_concurrency,
+                       include_jobs=include_jobs_list,
+                       include_notebooks=include_notebooks_list,
+                       inventory_ttl=inventory_ttl, job_concurrency=job_concurrency,
+                       job_hash_tag=job_hash_tag, jobs_api_version=jobs_api_version,
+                       jobs_dir=jobs_dir,
+                       list_concurrency=list_concurrency, manifest=manifest,
+                       no_cache=no_cache, notebooks_dir=notebooks_dir, owner=owner, prefix=prefix,
+                       refresh_inventory=refresh_inventory, remote_path=remote_path,
+                       skip_restart=skip_restart, trust_creator=trust_creator))
 
-    jobs_controller = JobsController(api_client, diff, dry_run, group_name)
+    # An explicit version overrides the one of the profile for every call to the Jobs API,
+    # including the creates, resets and deletes issued by the controllers.
+    if jobs_api_version:
+        api_client.jobs_api_version = jobs_api_version
+
+    inventory = None
+    if inventory_ttl:
+        inventory = Inventory(api_client.url, remote_path,
+                              dict(exclude_jobs=exclude_jobs_list,
+                                   exclude_notebooks=exclude_notebooks_list,
+                                   include_jobs=include_jobs_list,
+                                   include_notebooks=include_notebooks_list, owner=owner),
+                              inventory_ttl)
+
+    deploy_manifest = None
+    if hash_index:
+        deploy_manifest = RemoteManifest(WorkspaceClient(api_client), remote_path)
+    elif manifest:
+        deploy_manifest = Manifest(api_client.url, remote_path)
+
+    if deploy_manifest:
+        deploy_manifest.load()
+
+    digest_cache = None
+    if not no_cache:
+        digest_cache = DigestCache()
+        digest_cache.load()
+
+    diff_report = DiffReport(diff_output, diff_path, diff_max_lines)
+
+    jobs_controller = JobsController(api_client, diff, dry_run, group_name,
+                                     inventory, diff_report, job_hash_tag, job_concurrency)
     notebooks_controller = NotebooksController(api_client, diff, dry_run, notebooks_dir,
-                                               remote_path)
+                                               remote_path, inventory, bulk_export,
+                                               deploy_manifest, compare_workers, digest_cache,
+                                               diff_report, diff_engine, import_concurrency,
+                                               archive_import_threshold, exclude_notebooks_list,
+                                               include_notebooks_list)
 
     local_directories = utils.enumerate_local_directories(exclude_notebooks_list,
                                                           include_notebooks_list, notebooks_dir)
@@ -97,36 +203,62 @@ def databricks_cli(api_client: ApiClient, diff: bool, dry_run: bool, exclude_job
                                                         include_notebooks_list, notebooks_dir,
                                                         remote_path)
 
-    remote_paths = [*utils.enumerate_remote_paths(notebooks_controller.workspace_client,
-                                                  exclude_notebooks_list, include_notebooks_list,
-                                                  remote_path)]
-    remote_directories = {str(x.path) for x in remote_paths if x.is_dir}
-    remote_notebooks = {str(x.path) for x in remote_paths if not x.is_dir}
-
     local_jobs = utils.enumerate_local_jobs(exclude_jobs_list, include_jobs_list, jobs_dir, prefix)
     local_jobs_map = {job['name']: job for job in local_jobs}
 
-    remote_jobs = utils.enumerate_remote_jobs(notebooks_controller.jobs_client, exclude_jobs_list,
-                                              include_jobs_list, owner)
+    if inventory and not refresh_inventory and inventory.load():
+        logging.info('Using the remote inventory cached in %s.', inventory.path)
+
+        remote_paths = inventory.get_paths()
+        remote_jobs = inventory.get_jobs()
+    else:
+        remote_paths = [*utils.enumerate_remote_paths(notebooks_controller.workspace_client,
+                                                      exclude_notebooks_list,
+                                                      include_notebooks_list, remote_path,
+                                                      list_concurrency)]
+        # The hash index is managed by the deployment itself rather than the notebooks directory.
+        remote_paths = [x for x in remote_paths
+                        if x.path != get_remote_index_path(remote_path)]
+        remote_jobs = [*utils.enumerate_remote_jobs(notebooks_controller.jobs_client,
+                                                    exclude_jobs_list, include_jobs_list, owner,
+                                                    version=api_client.jobs_api_version,
+                                                    trust_creator=trust_creator)]
+
+        if inventory:
+            inventory.reset(remote_paths, remote_jobs)
+
+    remote_directories = {str(x.path) for x in remote_paths if x.is_dir}
+    remote_notebooks = {str(x.path) for x in remote_paths if not x.is_dir}
+    remote_objects = {str(x.path): x for x in remote_paths if not x.is_dir}
+
     remote_jobs_map = {job['settings']['name']: job for job in remote_jobs}
 
     remote_streaming_jobs = filter(lambda x: utils.is_streaming_job(x['settings']), remote_jobs)
     remote_streaming_jobs_map = {k: [*g] for k, g in groupby(remote_streaming_jobs,
                                                              utils.get_notebook_path)}
 
+    # Drop the cached inventory while changes are applied so that an interrupted run can never
+    # leave a stale snapshot behind.  The controllers write their changes through to it.
+    if inventory:
+        inventory.discard()
+
     # Update existing notebooks.
     logging.info('Checking for notebooks that require updating.')
     notebooks_to_restart = notebooks_controller.update(local_notebooks_map,
                                                        remote_streaming_jobs_map,
-                                                       remote_notebooks)
+                                                       remote_notebooks, remote_objects)
     notebooks_to_restart_map = {job_id: job_name for job_name, job_id in notebooks_to_restart}
     # Update existing jobs.
     logging.info('Checking for jobs that require updating.')
     jobs_to_restart = jobs_controller.update(local_jobs_map, remote_jobs_map)
     jobs_to_restart_map = {job_id: job_name for job_name, job_id in jobs_to_restart}
+
+    if diff:
+        diff_report.close()
+
     # Deploy new notebooks.
     logging.info('Checking for notebooks that require creation.')
-    notebooks_controller.create(local_notebooks_map, remote_notebooks)
+    notebooks_controller.create(local_notebooks_map, remote_notebooks, remote_directories)
     # Create new jobs.
     logging.info('Checking for jobs that require creation.')
     jobs_to_start = jobs_controller.create(local_jobs_map, remote_jobs_map, owner)
@@ -138,6 +270,16 @@ def databricks_cli(api_client: ApiClient, diff: bool, dry_run: bool, exclude_job
     logging.info('Checking for notebooks and directories that require deletion.')
     notebooks_controller.delete(local_directories, local_notebooks_map, remote_directories,
                                 remote_notebooks)
+    if inventory:
+        inventory.save()
+
+    if digest_cache:
+        digest_cache.save()
+
+    # A dry run never writes to the workspace, though it may still update local caches.
+    if deploy_manifest and not (dry_run and hash_index):
+        deploy_manifest.save()
+
     # Restart all necessary jobs.
     if not skip_restart:
         jobs_controller.restart({
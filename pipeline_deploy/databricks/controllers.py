@@ -18,61 +18,93 @@ SPDX-License-Identifier: Apache-2.0
 
 import logging
 import os
+import threading
 
-from typing import Any, Dict, Generator, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from typing import Any, Callable, Dict, Generator, List, Set, Tuple
+
+import requests
 
 from databricks_cli.jobs.api import JobsApi
 from databricks_cli.runs.api import RunsApi
 from databricks_cli.sdk.api_client import ApiClient
-from databricks_cli.workspace.api import WorkspaceApi
+from databricks_cli.workspace.api import NOTEBOOK, WorkspaceFileInfo
 from pipeline_deploy.controllers import BaseController
 from pipeline_deploy.databricks import utils
+from pipeline_deploy.databricks.api import WorkspaceClient
+from pipeline_deploy.databricks.cache import DigestCache, Inventory, Manifest
+from pipeline_deploy.databricks.diff import DEFAULT_DIFF_ENGINE
+from pipeline_deploy.databricks.report import DiffReport
 
 
 class DatabricksController(BaseController):
-    def __init__(self, api_client: ApiClient, dry_run: bool) -> None:
+    def __init__(self, api_client: ApiClient, dry_run: bool, inventory: Inventory = None,
+                 diff_report: DiffReport = None) -> None:
         super().__init__(dry_run)
 
         self.api_client = api_client
+        self.diff_report = diff_report or DiffReport()
+        self.inventory = inventory
         self.jobs_client = JobsApi(api_client)
         self.runs_client = RunsApi(api_client)
-        self.workspace_client = WorkspaceApi(api_client)
+        self.workspace_client = WorkspaceClient(api_client)
 
 
 class JobsController(DatabricksController):
     def __init__(self, api_client: ApiClient, diff: bool, dry_run: bool,
-                 group_name: str = None) -> None:
-        super().__init__(api_client, dry_run)
+                 group_name: str = None, inventory: Inventory = None,
+                 diff_report: DiffReport = None, hash_tag: bool = False,
+                 job_concurrency: int = utils.DEFAULT_JOB_CONCURRENCY) -> None:
+        super().__init__(api_client, dry_run, inventory, diff_report)
 
         self.diff = diff
         self.group_name = group_name
+        self.hash_tag = hash_tag
+        self.job_concurrency = job_concurrency
+        self.lock = threading.Lock()
 
     def create(self, local_jobs_map: dict, remote_jobs_map: dict,
                owner: str) -> Generator[Tuple[str, str], None, None]:
         jobs_to_create = list(local_jobs_map.keys() - remote_jobs_map.keys())
         jobs_to_create.sort()
 
-        for job_name in jobs_to_create:
-            local = local_jobs_map[job_name]
+        settings = {job_name: self._get_settings(local_jobs_map[job_name])
+                    for job_name in jobs_to_create}
 
+        for job_name in jobs_to_create:
             logging.info('Creating "%s" in the remote environment.', job_name)
 
-            if not self.dry_run:
-                resp = self.jobs_client.create_job(local)
-                job_id = resp['job_id']
-
-                if owner:
-                    utils.set_job_owner(self.api_client, job_id, owner)
+        # Jobs are only known by an id once they exist, so a dry run has none to start.
+        if not self.dry_run:
+            job_ids = self._mutate_jobs('create', {
+                job_name: partial(self._create_job, settings[job_name], owner)
+                for job_name in jobs_to_create
+            })
 
-                if self.group_name:
-                    utils.set_job_permissions(self.api_client, self.group_name, job_id)
-
-            if utils.is_streaming_job(local):
-                yield job_name, job_id
+            for job_name in jobs_to_create:
+                if utils.is_streaming_job(settings[job_name]):
+                    yield job_name, job_ids[job_name]
 
         if len(jobs_to_create) == 0:
             logging.info('No jobs require creation.')
 
+    def _create_job(self, local: dict, owner: str) -> str:
+        job_id = self.jobs_client.create_job(local)['job_id']
+
+        if owner:
+            utils.set_job_owner(self.api_client, job_id, owner)
+
+        if self.group_name:
+            utils.set_job_permissions(self.api_client, self.group_name, job_id)
+
+        if self.inventory:
+            with self.lock:
+                self.inventory.set_job({'job_id': job_id, 'settings': local})
+
+        return job_id
+
     def delete(self, local_jobs_map: dict, remote_jobs_map: dict):
         jobs_to_delete = list(remote_jobs_map.keys() - local_jobs_map.keys())
         jobs_to_delete.sort()
@@ -80,12 +112,70 @@ class JobsController(DatabricksController):
         for job_name in jobs_to_delete:
             logging.info('Removing "%s" from the remote environment.', job_name)
 
-            if not self.dry_run:
-                self.jobs_client.delete_job(remote_jobs_map[job_name]['job_id'])
+        if not self.dry_run:
+            self._mutate_jobs('delete', {
+                job_name: partial(self._delete_job, remote_jobs_map[job_name]['job_id'])
+                for job_name in jobs_to_delete
+            })
 
         if len(jobs_to_delete) == 0:
             logging.info('No jobs require deletion.')
 
+    def _delete_job(self, job_id: str):
+        self.jobs_client.delete_job(job_id)
+
+        if self.inventory:
+            with self.lock:
+                self.inventory.remove_job(job_id)
+
+    def _get_changes(self, remote: dict, local: dict) -> List[Tuple[str, Any, Any]]:
+        """Describes how the remote settings differ from the local ones.  A job tagged with
+        the fingerprint of the local settings, whose settings from the list response still
+        match that tag, is unchanged without a structural comparison; a job edited since it
+        was tagged no longer matches its tag and is compared in full.  Only jobs created or
+        reset with `hash_tag` set carry the tag, so unchanged jobs deployed before it was
+        enabled are compared in full until their settings next change."""
+
+        tag = remote.get('tags', {}).get(utils.JOB_HASH_TAG)
+
+        if tag and tag == utils.get_job_settings_hash(local) \
+                and tag == utils.get_job_settings_hash(remote):
+            return []
+
+        return [*utils.diff_job_settings(utils.normalise_job_settings(remote),
+                                         utils.normalise_job_settings(local))]
+
+    def _get_settings(self, local: dict) -> dict:
+        return utils.tag_job_settings(local) if self.hash_tag else local
+
+    def _mutate_jobs(self, action: str, mutations: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """Runs the `mutations`, keyed by job name, on a bounded pool and returns their
+        results by job name.  A failed mutation does not stop the others; the failures are
+        summarised once every mutation has finished."""
+
+        with ThreadPoolExecutor(max_workers=self.job_concurrency) as executor:
+            futures = {job_name: executor.submit(mutation)
+                       for job_name, mutation in sorted(mutations.items())}
+
+        failures = [(job_name, future.exception()) for job_name, future in futures.items()
+                    if future.exception()]
+
+        for job_name, ex in failures:
+            logging.error('Unable to %s "%s": %s', action, job_name, ex)
+
+        if failures:
+            raise RuntimeError(f'Unable to {action} {len(failures)} of {len(mutations)} jobs: '
+                               f'{", ".join(job_name for job_name, _ in failures)}')
+
+        return {job_name: future.result() for job_name, future in futures.items()}
+
+    def _reset_job(self, remote: dict, local: dict):
+        self.jobs_client.reset_job({'job_id': str(remote['job_id']), 'new_settings': local})
+
+        if self.inventory:
+            with self.lock:
+                self.inventory.set_job({**remote, 'settings': local})
+
     def restart(self, jobs: Dict[str, str]):
         for job_id, job_name in jobs.items():
             logging.info('Restarting streaming job "%s" in the remote environment.', job_name)
@@ -95,34 +185,37 @@ class JobsController(DatabricksController):
 
     def update(self, local_jobs_map: dict,
                remote_jobs_map: dict) -> Generator[Tuple[str, str], None, None]:
-        def requires_reset(job_name: str):
-            local_settings = local_jobs_map[job_name]
-            remote_settings = remote_jobs_map[job_name]['settings']
-
-            return local_settings != remote_settings
-
-        jobs_to_reset = list(
-            filter(requires_reset, remote_jobs_map.keys() & local_jobs_map.keys())
-        )
+        # The same walk of the settings decides whether a reset is needed and describes it.
+        # Server defaults and ordering are normalised away first, so that redeploying
+        # unchanged jobs makes no writes.
+        changes = {job_name: self._get_changes(remote_jobs_map[job_name]['settings'],
+                                               local_jobs_map[job_name])
+                   for job_name in remote_jobs_map.keys() & local_jobs_map.keys()}
+
+        jobs_to_reset = [job_name for job_name in changes if changes[job_name]]
         jobs_to_reset.sort()
 
-        for job_name in jobs_to_reset:
-            job_id = str(remote_jobs_map[job_name]['job_id'])
-            local = local_jobs_map[job_name]
+        settings = {job_name: self._get_settings(local_jobs_map[job_name])
+                    for job_name in jobs_to_reset}
 
+        for job_name in jobs_to_reset:
             if self.diff:
                 logging.info('Changes detected for "%s" between the remote and local environment',
                              job_name)
 
-                utils.print_job_diff(job_name, local, remote_jobs_map[job_name]['settings'])
+                utils.print_job_diff(job_name, changes[job_name], self.diff_report)
 
             logging.info('Resetting "%s" in the remote environment.', job_name)
 
-            if not self.dry_run:
-                self.jobs_client.reset_job({'job_id': job_id, 'new_settings': local})
+        if not self.dry_run:
+            self._mutate_jobs('reset', {
+                job_name: partial(self._reset_job, remote_jobs_map[job_name], settings[job_name])
+                for job_name in jobs_to_reset
+            })
 
-            if utils.is_streaming_job(local):
-                yield job_name, job_id
+        for job_name in jobs_to_reset:
+            if utils.is_streaming_job(settings[job_name]):
+                yield job_name, str(remote_jobs_map[job_name]['job_id'])
 
         if len(jobs_to_reset) == 0:
             logging.info('No jobs require resetting.')
@@ -130,25 +223,52 @@ class JobsController(DatabricksController):
 
 class NotebooksController(DatabricksController):
     def __init__(self, api_client: ApiClient, diff: bool, dry_run: bool, notebooks_dir: str,
-                 remote_path: str) -> None:
-        super().__init__(api_client, dry_run)
-
+                 remote_path: str, inventory: Inventory = None, bulk_export: bool = False,
+                 manifest: Manifest = None,
+                 compare_workers: int = utils.DEFAULT_COMPARE_WORKERS,
+                 digest_cache: DigestCache = None, diff_report: DiffReport = None,
+                 diff_engine: str = DEFAULT_DIFF_ENGINE,
+                 import_concurrency: int = utils.DEFAULT_IMPORT_CONCURRENCY,
+                 archive_threshold: int = utils.DEFAULT_ARCHIVE_IMPORT_THRESHOLD,
+                 exclude_notebooks: List[str] = None,
+                 include_notebooks: List[str] = None) -> None:
+        super().__init__(api_client, dry_run, inventory, diff_report)
+
+        self.archive_threshold = archive_threshold
+        self.bulk_export = bulk_export
+        self.compare_workers = compare_workers
+        self.digest_cache = digest_cache
         self.diff = diff
+        self.diff_engine = diff_engine
+        self.exclude_notebooks = exclude_notebooks
+        self.import_concurrency = import_concurrency
+        self.include_notebooks = include_notebooks
+        self.lock = threading.Lock()
+        self.manifest = manifest
         self.notebooks_dir = notebooks_dir
         self.remote_path = remote_path
 
-    def create(self, local_notebooks_map: dict, remote_notebooks: Set[str]):
+    def create(self, local_notebooks_map: dict, remote_notebooks: Set[str],
+               remote_directories: Set[str] = None):
         notebooks_to_create_remote = list(sorted(local_notebooks_map.keys() - remote_notebooks))
 
         for remote in notebooks_to_create_remote:
-            local = local_notebooks_map[remote]
-
             logging.info('Creating "%s" in the remote environment.', remote)
 
-            if not self.dry_run:
-                language = utils.get_language_for_notebook(local)
-                self.workspace_client.mkdirs(os.path.dirname(remote))
-                self.workspace_client.import_workspace(local, remote, language, 'SOURCE', True)
+        if not self.dry_run:
+            remote_paths = remote_notebooks | (remote_directories or set())
+
+            # New directories holding enough notebooks are imported whole, as one archive each.
+            archives, notebooks = utils.plan_archive_imports(notebooks_to_create_remote,
+                                                             remote_paths, self.remote_path,
+                                                             self.archive_threshold)
+
+            self._make_directories(utils.plan_mkdirs([*notebooks, *archives], remote_paths))
+            self._import_notebooks([(remote, local_notebooks_map[remote])
+                                    for remote in notebooks], True,
+                                   {directory: [(remote, local_notebooks_map[remote])
+                                                for remote in paths]
+                                    for directory, paths in archives.items()})
 
         if len(notebooks_to_create_remote) == 0:
             logging.info('No notebooks require creation.')
@@ -158,53 +278,231 @@ class NotebooksController(DatabricksController):
         local_directories_mapped = {d.replace(self.notebooks_dir, self.remote_path)
                                     for d in local_directories}
 
-        directories_to_delete_remote = set(remote_directories - local_directories_mapped)
-        directories_to_delete_remote = list(sorted(directories_to_delete_remote, reverse=True))
+        # Directories and notebooks within a directory being deleted go along with it.
+        directories_to_delete_remote, notebooks_to_delete_remote = utils.plan_deletes(
+            remote_directories - local_directories_mapped,
+            remote_notebooks - local_notebooks_map.keys())
+
         for directory in directories_to_delete_remote:
             logging.info('Deleting "%s" in the remote environment.', directory)
 
             if not self.dry_run:
                 self.workspace_client.delete(directory, True)
 
+                if self.inventory:
+                    self.inventory.remove_path(directory, True)
+
+                if self.manifest:
+                    self.manifest.remove(directory, True)
+
         if len(directories_to_delete_remote) == 0:
             logging.info('No directories require deletion.')
 
-        notebooks_to_delete_remote = list(remote_notebooks - local_notebooks_map.keys())
         for notebook in notebooks_to_delete_remote:
-            directory = os.path.dirname(notebook)
-
-            if directory in directories_to_delete_remote:
-                continue
-
             logging.info('Deleting "%s" in the remote environment.', notebook)
 
             if not self.dry_run:
                 self.workspace_client.delete(notebook, False)
 
+                if self.inventory:
+                    self.inventory.remove_path(notebook)
+
+                if self.manifest:
+                    self.manifest.remove(notebook)
+
         if len(notebooks_to_delete_remote) == 0:
             logging.info('No notebooks require deletion.')
 
+    def _export_directories(self, notebooks: List[str],
+                            remote_notebooks: Set[str]) -> Dict[str, str]:
+        exports, _ = utils.plan_directory_exports(notebooks, remote_notebooks, self.remote_path,
+                                                  exclude=self.exclude_notebooks,
+                                                  include=self.include_notebooks)
+
+        remote_sources = {}
+        for directory, paths in sorted(exports.items()):
+            logging.debug('Exporting %d notebooks within "%s".', len(paths), directory)
+
+            try:
+                remote_sources.update(utils.export_directory(self.workspace_client, directory))
+            except requests.exceptions.HTTPError as ex:
+                # Directories past the export size limit are compared one notebook at a time.
+                logging.debug('Unable to export "%s" as a whole: %s', directory, ex)
+
+        return remote_sources
+
+    def _get_digest(self, local: str) -> str:
+        if self.digest_cache:
+            return self.digest_cache.get_digest(local)
+
+        return utils.get_notebook_digest(local)
+
+    def _import_archive(self, directory: str, notebooks: List[Tuple[str, str]]):
+        logging.debug('Importing %d notebooks as the directory "%s".', len(notebooks), directory)
+
+        prefix = directory.rstrip('/') + '/'
+
+        try:
+            self.workspace_client.import_archive(directory, {
+                remote[len(prefix):] + os.path.splitext(local)[1]: local
+                for remote, local in notebooks
+            })
+        except requests.exceptions.HTTPError as ex:
+            # The directory may exist after all, holding only objects the listing filtered
+            # out.  Directories can not be overwritten, so import its notebooks one at a time.
+            if ex.response.json()['error_code'] != 'RESOURCE_ALREADY_EXISTS':
+                raise
+
+            logging.debug('"%s" already exists, importing its notebooks one at a time.',
+                          directory)
+
+            for missing in utils.plan_mkdirs([remote for remote, _ in notebooks], []):
+                self.workspace_client.mkdirs(missing)
+
+            for remote, local in notebooks:
+                self._import_notebook(remote, local, True)
+
+            return
+
+        # The manifest is left for the next update to fill in, rather than asking for the status
+        # of each notebook in the archive.
+        if self.inventory:
+            with self.lock:
+                for remote, local in notebooks:
+                    self.inventory.add_path(remote, NOTEBOOK,
+                                            utils.get_language_for_notebook(local))
+
+    def _import_notebook(self, remote: str, local: str, is_new: bool):
+        language = utils.get_language_for_notebook(local)
+
+        self.workspace_client.import_workspace(local, remote, language, 'SOURCE', True)
+
+        if self.manifest:
+            # Capture the metadata the workspace assigned to the notebook just imported.
+            status = self.workspace_client.get_status(remote)
+            digest = self._get_digest(local)
+
+        # The inventory and manifest are shared between the import workers.
+        with self.lock:
+            if is_new and self.inventory:
+                self.inventory.add_path(remote, NOTEBOOK, language)
+
+            if self.manifest:
+                self._record_deployment(status, digest)
+
+    def _import_notebooks(self, notebooks: List[Tuple[str, str]], is_new: bool,
+                          archives: Dict[str, List[Tuple[str, str]]] = None):
+        """Imports the notebooks, and any `archives` of notebooks, on a bounded pool.  A
+        failed import does not stop the others; the failures are summarised once every
+        import has finished."""
+
+        archives = archives or {}
+
+        with ThreadPoolExecutor(max_workers=self.import_concurrency) as executor:
+            futures = [(directory, len(paths),
+                        executor.submit(self._import_archive, directory, paths))
+                       for directory, paths in sorted(archives.items())]
+            futures += [(remote, 1, executor.submit(self._import_notebook, remote, local, is_new))
+                        for remote, local in notebooks]
+
+        failures = [(path, count, future.exception()) for path, count, future in futures
+                    if future.exception()]
+
+        for path, _, ex in failures:
+            logging.error('Unable to import "%s": %s', path, ex)
+
+        if failures:
+            total = len(notebooks) + sum(len(paths) for paths in archives.values())
+
+            raise RuntimeError(f'{sum(count for _, count, _ in failures)} of {total} notebooks '
+                               f'could not be imported: '
+                               f'{", ".join(path for path, _, _ in failures)}')
+
+    def _make_directories(self, directories: List[str]):
+        for directory in directories:
+            logging.debug('Creating the directory "%s".', directory)
+
+        with ThreadPoolExecutor(max_workers=self.import_concurrency) as executor:
+            list(executor.map(self.workspace_client.mkdirs, directories))
+
+    def _record_deployment(self, status: WorkspaceFileInfo, digest: str):
+        self.manifest.record(status, digest)
+
+        if self.inventory:
+            self.inventory.set_path(status)
+
     def update(self, local_notebooks_map: dict, remote_streaming_jobs_map: Dict[str, Any],
-               remote_notebooks: Set[str]) -> Generator[Tuple[str, str], None, None]:
+               remote_notebooks: Set[str],
+               remote_objects: Dict[str, WorkspaceFileInfo] = None
+               ) -> Generator[Tuple[str, str], None, None]:
         existing_notebooks_remote = list(local_notebooks_map.keys() & remote_notebooks)
         existing_notebooks = [(key, local_notebooks_map[key])
                               for key in existing_notebooks_remote]
 
         notebooks_to_update = sorted(existing_notebooks)
 
-        def _is_notebook_updated(tpl: Tuple[str, str]):
+        # Notebooks that neither side has touched since they were last known to match can be
+        # skipped without downloading them.
+        digests = {}
+        if self.manifest and remote_objects:
+            digests = {remote: self._get_digest(local)
+                       for remote, local in notebooks_to_update if remote in remote_objects}
+            notebooks_to_update = [
+                (remote, local) for remote, local in notebooks_to_update
+                if remote not in digests
+                or not self.manifest.is_unchanged(remote_objects[remote], digests[remote])
+            ]
+
+        remote_sources = {}
+        if self.bulk_export:
+            remote_sources = self._export_directories([key for key, _ in notebooks_to_update],
+                                                      remote_notebooks)
+
+        def _compare(tpl: Tuple[str, str]):
             (remote, local) = tpl
-            return utils.is_notebook_updated(self.workspace_client, self.diff, local, remote)
-        notebooks_to_update = [*filter(_is_notebook_updated, notebooks_to_update)]
 
-        for remote, local in notebooks_to_update:
+            remote_source = remote_sources.get(remote)
+            if remote_source is None:
+                remote_source = self.workspace_client.export_source(remote)
+
+            local_digest = self.digest_cache.get_digest(local) if self.digest_cache else None
+            is_updated = utils.is_notebook_source_updated(local, remote_source, local_digest)
+
+            if not is_updated and remote in digests:
+                with self.lock:
+                    self.manifest.record(remote_objects[remote], digests[remote])
+
+            # Only the sources that will be diffed are kept until every comparison finishes.
+            return is_updated, remote_source if is_updated and self.diff else None
+
+        # Notebooks are exported and compared concurrently, but the results are consumed in
+        # their sorted order so that the diffs and updates are always logged in that order.
+        with ThreadPoolExecutor(max_workers=self.compare_workers) as executor:
+            results = executor.map(_compare, notebooks_to_update)
+
+            notebooks_compared = [*zip(notebooks_to_update, results)]
+
+        notebooks_to_update = []
+        for (remote, local), (is_updated, remote_source) in notebooks_compared:
+            if not is_updated:
+                continue
+
+            if self.diff:
+                logging.info('Changes detected for "%s" between the remote and local environment',
+                             remote)
+
+                utils.print_notebook_diff(local, remote, remote_source, self.diff_report,
+                                          self.diff_engine)
+
+            notebooks_to_update.append((remote, local))
+
+        for remote, _ in notebooks_to_update:
             logging.info('Updating "%s" in the remote environment.', remote)
 
-            if not self.dry_run:
-                self.workspace_client.import_workspace(local, remote,
-                                                       utils.get_language_for_notebook(local),
-                                                       'SOURCE', True)
+        if not self.dry_run:
+            self._import_notebooks(notebooks_to_update, False)
 
+        for remote, _ in notebooks_to_update:
             try:
                 for job in remote_streaming_jobs_map[remote]:
                     yield job['settings']['name'], job['job_id']
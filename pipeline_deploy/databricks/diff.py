@@ -0,0 +1,219 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+
+import difflib
+
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_DIFF_ENGINE = 'patience'
+
+# Regions whose edit distance exceeds this are reported as replaced outright, which bounds
+# the work done on inputs that have nothing in common.
+MAX_EDIT_COST = 1000
+
+
+class PatienceMatcher:
+    """Computes the same opcodes as `difflib.SequenceMatcher`, using patience diff: lines
+    that occur exactly once on both sides anchor the alignment, and the regions between
+    anchors are aligned with Myers' O(ND) algorithm.  Unlike `SequenceMatcher`, this does
+    not degrade on inputs with many repeated lines."""
+
+    get_grouped_opcodes = difflib.SequenceMatcher.get_grouped_opcodes
+
+    def __init__(self, a: Sequence[str], b: Sequence[str]) -> None:
+        self.a = a
+        self.b = b
+
+    def get_matching_pairs(self) -> List[Tuple[int, int]]:
+        pairs = []
+        self._match(0, len(self.a), 0, len(self.b), pairs)
+
+        return pairs
+
+    def get_opcodes(self) -> List[Tuple[str, int, int, int, int]]:
+        opcodes = []
+        i = j = 0
+
+        for ai, bj in [*self.get_matching_pairs(), (len(self.a), len(self.b))]:
+            if i < ai or j < bj:
+                tag = 'replace' if i < ai and j < bj else 'delete' if i < ai else 'insert'
+                opcodes.append((tag, i, ai, j, bj))
+
+            if ai < len(self.a):
+                if opcodes and opcodes[-1][0] == 'equal':
+                    opcodes[-1] = ('equal', opcodes[-1][1], ai + 1, opcodes[-1][3], bj + 1)
+                else:
+                    opcodes.append(('equal', ai, ai + 1, bj, bj + 1))
+
+            i, j = ai + 1, bj + 1
+
+        return opcodes
+
+    def _anchors(self, alo: int, ahi: int, blo: int, bhi: int) -> List[Tuple[int, int]]:
+        a_counts = Counter(self.a[alo:ahi])
+        b_counts = Counter(self.b[blo:bhi])
+        b_unique = {self.b[j]: j for j in range(blo, bhi) if b_counts[self.b[j]] == 1}
+
+        candidates = [(i, b_unique[self.a[i]]) for i in range(alo, ahi)
+                      if a_counts[self.a[i]] == 1 and self.a[i] in b_unique]
+
+        # The longest run of candidates in increasing order on both sides (patience sorting).
+        tails, tail_indexes, previous = [], [], []
+        for index, (_, j) in enumerate(candidates):
+            position = bisect_left(tails, j)
+
+            if position == len(tails):
+                tails.append(j)
+                tail_indexes.append(index)
+            else:
+                tails[position] = j
+                tail_indexes[position] = index
+
+            previous.append(tail_indexes[position - 1] if position else None)
+
+        anchors = []
+        index = tail_indexes[-1] if tail_indexes else None
+        while index is not None:
+            anchors.append(candidates[index])
+            index = previous[index]
+
+        return anchors[::-1]
+
+    def _match(self, alo: int, ahi: int, blo: int, bhi: int, pairs: List[Tuple[int, int]]):
+        while alo < ahi and blo < bhi and self.a[alo] == self.b[blo]:
+            pairs.append((alo, blo))
+            alo, blo = alo + 1, blo + 1
+
+        suffix = []
+        while alo < ahi and blo < bhi and self.a[ahi - 1] == self.b[bhi - 1]:
+            ahi, bhi = ahi - 1, bhi - 1
+            suffix.append((ahi, bhi))
+
+        if alo < ahi and blo < bhi:
+            anchors = self._anchors(alo, ahi, blo, bhi)
+
+            if anchors:
+                for ai, bj in anchors:
+                    self._match(alo, ai, blo, bj, pairs)
+                    pairs.append((ai, bj))
+                    alo, blo = ai + 1, bj + 1
+
+                self._match(alo, ahi, blo, bhi, pairs)
+            else:
+                pairs.extend(self._myers(alo, ahi, blo, bhi))
+
+        pairs.extend(reversed(suffix))
+
+    def _myers(self, alo: int, ahi: int, blo: int, bhi: int) -> List[Tuple[int, int]]:
+        n, m = ahi - alo, bhi - blo
+        v = {1: 0}
+        trace = []
+
+        for d in range(min(n + m, MAX_EDIT_COST) + 1):
+            trace.append(dict(v))
+
+            for k in range(-d, d + 1, 2):
+                if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                    x = v[k + 1]
+                else:
+                    x = v[k - 1] + 1
+
+                y = x - k
+                while x < n and y < m and self.a[alo + x] == self.b[blo + y]:
+                    x, y = x + 1, y + 1
+
+                v[k] = x
+
+                if x >= n and y >= m:
+                    return self._backtrack(trace, n, m, alo, blo)
+
+        return []
+
+    @staticmethod
+    def _backtrack(trace: List[Dict[int, int]], x: int, y: int, alo: int,
+                   blo: int) -> List[Tuple[int, int]]:
+        pairs = []
+
+        for d in range(len(trace) - 1, -1, -1):
+            v = trace[d]
+            k = x - y
+
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                previous_k = k + 1
+            else:
+                previous_k = k - 1
+
+            previous_x = v[previous_k]
+            previous_y = previous_x - previous_k
+
+            while x > previous_x and y > previous_y:
+                x, y = x - 1, y - 1
+                pairs.append((alo + x, blo + y))
+
+            x, y = previous_x, previous_y
+
+        return pairs[::-1]
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+
+    if length == 1:
+        return f'{start + 1}'
+
+    return f'{start + 1 if length else start},{length}'
+
+
+def patience_unified_diff(a: Sequence[str], b: Sequence[str], fromfile: str = '',
+                          tofile: str = '', n: int = 3, lineterm: str = '\n') -> Iterator[str]:
+    """A drop-in replacement for `difflib.unified_diff` backed by `PatienceMatcher`."""
+
+    started = False
+
+    for group in PatienceMatcher(a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}{lineterm}'
+            yield f'+++ {tofile}{lineterm}'
+
+        first, last = group[0], group[-1]
+        yield f'@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@' \
+              f'{lineterm}'
+
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+
+
+DIFF_ENGINES: Dict[str, Callable[..., Iterator[str]]] = {
+    'difflib': difflib.unified_diff,
+    'patience': patience_unified_diff,
+}
@@ -0,0 +1,82 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import json
+import logging
+import os
+
+from itertools import islice
+from typing import Iterable
+
+DEFAULT_DIFF_MAX_LINES = 1000
+DIFF_OUTPUTS = ('log', 'file', 'json')
+
+
+class DiffReport:
+    """Collects the differences found between the remote and local environments.  Each
+    difference is emitted as a single block, either as one log record, appended to a text
+    file, or gathered into a JSON document that is written when the report is closed.
+    Differences longer than `max_lines` are truncated."""
+
+    def __init__(self, output: str = 'log', path: str = None,
+                 max_lines: int = DEFAULT_DIFF_MAX_LINES) -> None:
+        self.diffs = []
+        self.max_lines = max_lines
+        self.output = output
+        self.path = path or os.path.join('.pipeline-deploy',
+                                         'diff.json' if output == 'json' else 'diff.txt')
+        self.stream = None
+
+    def add(self, kind: str, name: str, delta: Iterable[str]):
+        lines = [line.rstrip('\n') for line in islice(delta, self.max_lines + 1)]
+        is_truncated = len(lines) > self.max_lines
+
+        if is_truncated:
+            lines = lines[:self.max_lines]
+
+        if self.output == 'json':
+            self.diffs.append({'type': kind, 'name': name, 'lines': lines,
+                               'truncated': is_truncated})
+            return
+
+        if is_truncated:
+            lines.append(f'... truncated after {self.max_lines} lines.')
+
+        if self.output == 'file':
+            if self.stream is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.stream = open(self.path, 'w')  # pylint: disable=consider-using-with
+
+            self.stream.write('\n'.join([f'### {kind} {name}', *lines, '', '']))
+        else:
+            logging.info('Differences for %s "%s":\n%s', kind, name, '\n'.join(lines))
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+            logging.info('Wrote the differences to %s.', self.path)
+
+        if self.output == 'json':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+            with open(self.path, 'w') as dst:
+                json.dump({'diffs': self.diffs}, dst, indent=2)
+
+            logging.info('Wrote the differences to %s.', self.path)
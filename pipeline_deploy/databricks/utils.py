@@ -16,19 +16,24 @@ limitations under the License.
 SPDX-License-Identifier: Apache-2.0
 """
 
-import difflib
+import hashlib
+import io
 import json
 import logging
 import os
 import re
+import zipfile
 
+from base64 import b64decode
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from fnmatch import fnmatch
-from itertools import chain
+from functools import lru_cache
+from itertools import chain, zip_longest
 from os.path import splitext
 from pathlib import Path
-from tempfile import mkstemp
 from time import sleep
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
 
 import requests
 
@@ -36,7 +41,66 @@ from databricks_cli.jobs.api import JobsApi
 from databricks_cli.runs.api import RunsApi
 from databricks_cli.sdk.api_client import ApiClient
 from databricks_cli.workspace.api import WorkspaceApi
-
+from pipeline_deploy.databricks.diff import DEFAULT_DIFF_ENGINE, DIFF_ENGINES
+from pipeline_deploy.databricks.report import DiffReport
+
+DEFAULT_ARCHIVE_IMPORT_THRESHOLD = 100
+DEFAULT_COMPARE_WORKERS = 8
+DEFAULT_IMPORT_CONCURRENCY = 4
+DEFAULT_JOB_CONCURRENCY = 4
+DEFAULT_JOBS_PAGE_SIZE = 25
+DEFAULT_LIST_CONCURRENCY = 8
+DEFAULT_OWNER_CONCURRENCY = 8
+MAX_DIRECTORY_EXPORT_NOTEBOOKS = 250
+
+# Bump whenever `normalise_lines` changes, so that cached digests are recomputed.
+NORMALISER_VERSION = 3
+
+# The line comment that introduces the framing added to exported notebook sources.
+NOTEBOOK_COMMENTS = {'PYTHON': '#', 'R': '#', 'SCALA': '//', 'SQL': '--'}
+
+NOTEBOOK_EXTENSIONS = ('.py', '.r', '.scala', '.sql')
+
+# Marks the digests of local notebooks that carry their own cell separators.
+FRAMED_DIGEST_PREFIX = 'framed:'
+
+# Stands in for a setting that is absent from one side of a job settings comparison.
+MISSING = object()
+
+# The job tag that records the fingerprint of the settings a job was last deployed with.
+JOB_HASH_TAG = 'pipeline_deploy_hash'
+
+# The versions of the Jobs API that deployments may be run against.
+JOBS_API_VERSIONS = ('2.0', '2.1')
+
+# Values that the Jobs API fills in for settings that were not supplied, keyed by the path of
+# the setting with `[*]` standing for any list item.  A default may also be a function of the
+# object holding the setting.  Settings equal to their default are dropped before comparing.
+JOB_SETTINGS_DEFAULTS = {
+    'email_notifications': {},
+    'format': lambda settings: 'MULTI_TASK' if 'tasks' in settings else 'SINGLE_TASK',
+    'max_concurrent_runs': 1,
+    'max_retries': 0,
+    'tasks[*].email_notifications': {},
+    'tags': {},
+    'tasks[*].timeout_seconds': 0,
+    'timeout_seconds': 0,
+    'webhook_notifications': {},
+}
+
+# Settings that are dropped before comparing, keyed by path.
+JOB_SETTINGS_IGNORED = (
+    'tags.' + JOB_HASH_TAG,
+)
+
+# Lists whose order the Jobs API does not preserve, keyed by path, with the key to sort by.
+JOB_SETTINGS_ORDERING = {
+    'job_clusters': 'job_cluster_key',
+    'tasks': 'task_key',
+    'tasks[*].depends_on': 'task_key',
+}
+
+GLOB_REGEX = re.compile(r'[*?[]')
 RUNNING_REGEX = re.compile(r'running|pending|terminating', re.IGNORECASE)
 
 
@@ -85,6 +149,48 @@ def _explode_permissions(entry):
     return [{**permission, **rest} for permission in all_permissions]
 
 
+def _get_existing_directories(remote_paths: Iterable[str]):
+    # Every directory above an existing remote object must exist too.
+    existing = set()
+    for path in remote_paths:
+        directory = path.rstrip('/')
+
+        while directory not in existing and os.path.dirname(directory) != directory:
+            existing.add(directory)
+            directory = os.path.dirname(directory)
+
+    return existing
+
+
+def _get_framing(language: str) -> Tuple[str, str]:
+    # The header and cell separator lines of a Databricks source notebook in `language`.
+    comment = NOTEBOOK_COMMENTS.get(language)
+
+    if not comment:
+        return None, None
+
+    return f'{comment} Databricks notebook source', f'{comment} COMMAND ----------'
+
+
+def diff_job_settings(remote: Any, local: Any,
+                      path: str = '') -> Iterator[Tuple[str, Any, Any]]:
+    """Walks the remote and local job settings together, yielding the path, remote value and
+    local value of every leaf that differs, e.g. `('tasks[3].new_cluster.num_workers', 4,
+    8)`.  A value that is absent from one side is reported as `MISSING`."""
+
+    if isinstance(remote, dict) and isinstance(local, dict):
+        for key in sorted(remote.keys() | local.keys(), key=str):
+            yield from diff_job_settings(remote.get(key, MISSING), local.get(key, MISSING),
+                                         f'{path}.{key}' if path else str(key))
+    elif isinstance(remote, list) and isinstance(local, list):
+        for i in range(max(len(remote), len(local))):
+            yield from diff_job_settings(remote[i] if i < len(remote) else MISSING,
+                                         local[i] if i < len(local) else MISSING,
+                                         f'{path}[{i}]')
+    elif remote != local:
+        yield path, remote, local
+
+
 def enumerate_local_directories(exclude: List[str], include: List[str], path: str):
     for i in Path(path).glob("**/*"):
         if not i.is_dir():
@@ -138,37 +244,81 @@ def enumerate_local_notebooks(exclude: List[str], include: List[str], path: str)
             yield result
 
 
-def enumerate_remote_jobs(client: JobsApi, exclude: List[str], include: List[str], owner: str):
+def enumerate_remote_jobs(client: JobsApi, exclude: List[str], include: List[str], owner: str,
+                          expand_tasks: bool = True, version: str = None,
+                          trust_creator: bool = False):
     if owner:
         logging.info('Compiling a list of all remote jobs owned by %s.', owner)
     else:
         logging.info('Compiling a list of all remote jobs.')
 
-    jobs = client.list_jobs()['jobs']
+    def _get_job_settings(job: dict):
+        # The list response already carries the full settings of each job, so the job is
+        # only fetched again when the listing left out something that is needed.
+        if 'settings' not in job:
+            return client.get_job(job['job_id'], version=version)
 
-    for job in jobs:
-        job_name = job['settings']['name']
+        return job
 
-        if not filter_jobs(exclude, include, job_name):
-            continue
+    jobs = map(_get_job_settings, list_remote_jobs(client, expand_tasks, version=version))
+    jobs = filter(lambda job: filter_jobs(exclude, include, job['settings']['name']), jobs)
 
-        if owner and get_job_owner(client.client.client, job['job_id']).lower() != owner:
-            continue
+    if owner:
+        jobs = filter_jobs_by_owner(client.client.client, jobs, owner, trust_creator)
+
+    for job in jobs:
+        if job.get('has_more', False):
+            job = client.get_job(job['job_id'], version=version)
 
-        yield client.get_job(job['job_id'])
+        yield job
 
 
 def enumerate_remote_paths(client: WorkspaceApi, exclude: List[str], include: List[str], path: str,
-                           is_recursed=False):
-    if not is_recursed:
-        logging.info('Compiling a list of all remote paths within %s.', path)
+                           concurrency: int = DEFAULT_LIST_CONCURRENCY):
+    """Walks the remote workspace breadth-first beneath `path`.  Directory listings are
+    submitted to a bounded pool as soon as their parent has been listed, so siblings are
+    fetched concurrently while the results are still yielded in a stable, level-by-level
+    order.  Directories whose entire contents would be filtered out are never listed."""
+
+    logging.info('Compiling a list of all remote paths within %s.', path)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque([executor.submit(client.list_objects, path)])
 
-    for obj in client.list_objects(path):
-        if filter_notebooks(exclude, include, obj.path):
-            yield obj
+        while pending:
+            for obj in pending.popleft().result():
+                if filter_notebooks(exclude, include, obj.path):
+                    yield obj
 
-        if obj.is_dir:
-            yield from enumerate_remote_paths(client, exclude, include, obj.path, True)
+                if obj.is_dir and not is_pruned_directory(exclude, include, obj.path):
+                    pending.append(executor.submit(client.list_objects, obj.path))
+
+
+def export_directory(client: WorkspaceApi, path: str):
+    """Exports every notebook beneath the remote directory at `path` with a single request.
+    The workspace returns the directory as a zip archive of notebook sources, nested beneath
+    a folder named after the directory, which is unpacked in memory into a map of remote
+    notebook path to source."""
+
+    response = client.client.export_workspace(path, 'SOURCE')
+
+    with zipfile.ZipFile(io.BytesIO(b64decode(response['content']))) as archive:
+        root = os.path.basename(path.rstrip('/')) + '/'
+
+        sources = {}
+        for name in archive.namelist():
+            if name.endswith('/') or not name.startswith(root):
+                continue
+
+            relative, extension = splitext(name[len(root):])
+
+            if extension.lower() not in NOTEBOOK_EXTENSIONS:
+                continue
+
+            remote = path.rstrip('/') + '/' + relative
+            sources[remote] = archive.read(name).decode('utf-8')
+
+    return sources
 
 
 def filter_jobs(exclude: List[str], include: List[str], job_name: str):
@@ -190,6 +340,36 @@ def filter_jobs(exclude: List[str], include: List[str], job_name: str):
     return True
 
 
+def filter_jobs_by_owner(client: ApiClient, jobs: Iterable[dict], owner: str,
+                         trust_creator: bool = False,
+                         concurrency: int = DEFAULT_OWNER_CONCURRENCY):
+    """Yields the jobs owned by `owner`, in their original order.  Owners are looked up
+    through a bounded pool as the `jobs` arrive, with no more than twice `concurrency`
+    lookups outstanding at a time.  With `trust_creator`, a job's `creator_user_name` from
+    the list payload is taken as its owner and no lookup is made for it; this is only
+    correct when job ownership is never transferred after creation."""
+
+    def _resolve_owner(job: dict):
+        if trust_creator and job.get('creator_user_name'):
+            return job['creator_user_name']
+
+        return get_job_owner(client, job['job_id'])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+
+        for job in chain(jobs, [None]):
+            if job is not None:
+                pending.append((job, executor.submit(_resolve_owner, job)))
+
+            # Drain the oldest lookups once the window is full, or everything at the end.
+            while pending and (job is None or len(pending) >= 2 * concurrency):
+                pending_job, future = pending.popleft()
+
+                if future.result().lower() == owner:
+                    yield pending_job
+
+
 def filter_notebooks(exclude: List[str], include: List[str], path: str):
     """This is distinct from `filter_jobs` to allow for additional logic later
     on without too much additional re-work."""
@@ -236,6 +416,15 @@ def get_job_owner(client: ApiClient, job_id: str):
     raise AttributeError(f'Owner for job {job_id} could not be found.')
 
 
+def get_job_settings_hash(settings: dict):
+    """Fingerprints the normalised settings, which excludes the fingerprint tag itself."""
+
+    canonical = json.dumps(normalise_job_settings(settings), sort_keys=True,
+                           separators=(',', ':'))
+
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
 def get_local_notebooks_map(exclude: List[str], include: List[str], local_path: str,
                             remote_path: str):
     local_notebooks = enumerate_local_notebooks(exclude, include, local_path)
@@ -262,10 +451,69 @@ def get_language_for_notebook(path: str):
     raise AttributeError(f'Unknown extension {extension.upper()}.')
 
 
+def get_lines_digest(lines: Iterable[str], language: str = None, is_framed: bool = False):
+    digest = hashlib.sha256()
+
+    for i, line in enumerate(normalise_lines(lines, language, is_framed)):
+        digest.update((f'\n{line}' if i else line).encode('utf-8'))
+
+    return (FRAMED_DIGEST_PREFIX if is_framed else '') + digest.hexdigest()
+
+
+def get_notebook_digest(path: str):
+    """Hashes the notebook at `path` after the same normalisation that is applied when
+    comparing it with its remote copy.  The digest records whether the notebook carries its
+    own cell separators, so that the remote copy can be hashed to match."""
+
+    language = get_language_for_notebook(path)
+
+    with open(path, 'r') as src:
+        lines = src.readlines()
+
+    return get_lines_digest(lines, language, is_framed_source(lines, language))
+
+
 def get_notebook_path(job: dict):
     return job['settings']['notebook_task']['notebook_path']
 
 
+def get_source_digest(source: str, language: str = None, is_framed: bool = False):
+    return get_lines_digest(io.StringIO(source, newline=None), language, is_framed)
+
+
+def is_filtered_directory(exclude: List[str], include: List[str], path: str):
+    """Determines whether anything beneath the directory at `path` could fail
+    `filter_notebooks`, in which case a listing of the directory is missing some of what it
+    holds.
+
+    An exclude pattern can only match a descendant when its literal prefix and the directory
+    prefix agree with each other.  Every descendant passes the include patterns only when
+    one of them ends in a wildcard and already matches the directory prefix."""
+
+    prefix = path.rstrip('/') + '/'
+
+    if exclude:
+        for excl in exclude:
+            literal = GLOB_REGEX.split(excl, 1)[0]
+
+            if literal.startswith(prefix) or prefix.startswith(literal):
+                return True
+
+    if include:
+        return not any(incl.endswith('*') and fnmatch(prefix, incl) for incl in include)
+
+    return False
+
+
+def is_framed_source(lines: Iterable[str], language: str = None):
+    """Determines whether the source carries any of the `Databricks notebook source`
+    framing, in which case its cell separators are significant."""
+
+    framing = {line for line in _get_framing(language) if line}
+
+    return any(line.strip() in framing for line in lines)
+
+
 def is_job_running(client: RunsApi, job_id: str, job_name: str):
     try:
         runs = client.list_runs(job_id, None, None, 0, 100)['runs']
@@ -284,41 +532,57 @@ def is_job_running(client: RunsApi, job_id: str, job_name: str):
         return False
 
 
-def is_notebook_updated(client: WorkspaceApi, diff: bool, local: str, remote: str):
-    (_, temp_notebook) = mkstemp()
+def is_notebook_source_updated(local: str, remote_source: str, local_digest: str = None):
+    """Compares the normalised sources line by line, stopping at the first difference.
+    When the digest of the local notebook is already known, the local file is not read at
+    all."""
 
-    client.export_workspace(remote, temp_notebook, 'SOURCE', True)
+    language = get_language_for_notebook(local)
 
-    with open(local, 'r') as local_notebook_stream:
-        local_notebook_lines_raw = local_notebook_stream.read().splitlines(False)
-        local_notebook_lines = remove_blank_lines(local_notebook_lines_raw)
-        local_notebook_lines = remove_whitespace(local_notebook_lines)
+    if local_digest is not None:
+        is_framed = local_digest.startswith(FRAMED_DIGEST_PREFIX)
+        has_changes = local_digest != get_source_digest(remote_source, language, is_framed)
+    else:
+        with open(local, 'r') as local_notebook_stream:
+            local_source = local_notebook_stream.readlines()
 
-        with open(temp_notebook, 'r') as remote_notebook_stream:
-            remote_notebook_lines_raw = remote_notebook_stream.read().splitlines(False)
-            remote_notebook_lines = remove_blank_lines(remote_notebook_lines_raw)
-            remote_notebook_lines = remove_whitespace(remote_notebook_lines)
+        is_framed = is_framed_source(local_source, language)
+        local_lines = normalise_lines(local_source, language, is_framed)
+        remote_lines = normalise_lines(io.StringIO(remote_source, newline=None), language,
+                                       is_framed)
 
-            delta = [*difflib.unified_diff(remote_notebook_lines,
-                                           local_notebook_lines,
-                                           fromfile=remote, tofile=local)]
+        has_changes = any(a != b for a, b in zip_longest(local_lines, remote_lines))
 
-            has_changes = len(delta) > 0
+    return has_changes
 
-            if diff and has_changes:
-                logging.info('Changes detected for "%s" between the remote and local environment',
-                             remote)
 
-                delta = difflib.unified_diff(remote_notebook_lines_raw,
-                                             local_notebook_lines_raw,
-                                             fromfile=remote, tofile=local)
-                for line in delta:
-                    logging.info(line)
+def is_pruned_directory(exclude: List[str], include: List[str], path: str):
+    """Determines whether nothing beneath the directory at `path` could pass
+    `filter_notebooks`, in which case there is no need to list its contents.
 
-    # Clean up the temporarily created file.
-    os.remove(temp_notebook)
+    An exclude pattern covers a whole subtree when it ends in a wildcard and already
+    matches the directory prefix (e.g. `/Shared/archive/*` for `/Shared/archive`), since
+    the trailing `*` absorbs anything appended below it.  An include pattern can only
+    match a descendant when its literal prefix (the text before the first wildcard) and
+    the directory prefix agree with each other."""
 
-    return has_changes
+    prefix = path.rstrip('/') + '/'
+
+    if exclude:
+        for excl in exclude:
+            if excl.endswith('*') and fnmatch(prefix, excl):
+                return True
+
+    if include:
+        for incl in include:
+            literal = GLOB_REGEX.split(incl, 1)[0]
+
+            if literal.startswith(prefix) or prefix.startswith(literal):
+                return False
+
+        return True
+
+    return False
 
 
 def is_streaming_job(job):
@@ -357,27 +621,247 @@ def is_streaming_notebook(jobs: List, notebooks_dir: str, remote_path: str):
     return fn
 
 
-def print_job_diff(job_name, local_job, remote_job):
-    local_job_json = json.dumps(local_job, sort_keys=True, indent=4)
-    remote_job_json = json.dumps(remote_job, sort_keys=True, indent=4)
+def list_remote_jobs(client: JobsApi, expand_tasks: bool = False,
+                     limit: int = DEFAULT_JOBS_PAGE_SIZE, version: str = None):
+    """Yields every job in the workspace one page at a time, following the `offset`,
+    `limit` and `has_more` paging of the Jobs API.  The next page is requested in the
+    background while the jobs of the current page are being consumed."""
+
+    def fetch(offset: int):
+        return client.list_jobs(expand_tasks=expand_tasks, offset=offset, limit=limit,
+                                version=version)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        offset = 0
+        page = executor.submit(fetch, offset)
+
+        while page is not None:
+            response = page.result()
+            jobs = response.get('jobs', [])
+            offset += len(jobs)
+
+            if jobs and response.get('has_more', False):
+                page = executor.submit(fetch, offset)
+            else:
+                page = None
+
+            yield from jobs
+
+
+def normalise_job_settings(settings: dict, defaults: Dict[str, Any] = None,
+                           ordering: Dict[str, str] = None,
+                           ignored: Iterable[str] = None) -> dict:
+    """Drops the ignored settings and those that equal the server's defaults, and sorts
+    the lists that the server reorders, so that local and remote settings only differ where
+    it matters."""
+
+    defaults = JOB_SETTINGS_DEFAULTS if defaults is None else defaults
+    ignored = set(JOB_SETTINGS_IGNORED if ignored is None else ignored)
+    ordering = JOB_SETTINGS_ORDERING if ordering is None else ordering
+
+    def _normalise(value: Any, path: str):
+        if isinstance(value, dict):
+            normalised = {}
+
+            for key, item in value.items():
+                child = f'{path}.{key}' if path else key
+                if child in ignored:
+                    continue
+
+                default = defaults.get(child, MISSING)
+
+                if callable(default):
+                    default = default(value)
+
+                normalised_item = _normalise(item, child)
+
+                if default is MISSING or normalised_item != default:
+                    normalised[key] = normalised_item
+
+            return normalised
+
+        if isinstance(value, list):
+            items = [_normalise(item, f'{path}[*]') for item in value]
+
+            if path in ordering:
+                items.sort(key=lambda item: str(item.get(ordering[path], ''))
+                           if isinstance(item, dict) else '')
+
+            return items
+
+        return value
+
+    return _normalise(settings, '')
+
+
+def normalise_lines(lines: Iterable[str], language: str = None,
+                    is_framed: bool = False) -> Iterator[str]:
+    """Lazily drops blank lines and trailing whitespace, including line endings.  Given the
+    notebook's language, it also drops the `Databricks notebook source` header that the
+    workspace adds to exported sources.  Unless the local notebook `is_framed` itself, the
+    `COMMAND ----------` cell separators are dropped too, so that notebooks committed
+    without that framing compare equal to their exports; a framed notebook keeps them, so
+    that merged, split or moved cells are still detected."""
+
+    header, separator = _get_framing(language)
+    dropped = {line for line in (header, None if is_framed else separator) if line}
+
+    for line in remove_whitespace(remove_blank_lines(lines)):
+        if line not in dropped:
+            yield line
+
+
+def plan_archive_imports(paths: List[str], remote_paths: Iterable[str], root: str,
+                         threshold: int = DEFAULT_ARCHIVE_IMPORT_THRESHOLD):
+    """Groups the new remote notebook `paths` by the topmost directory beneath `root` that
+    does not exist yet in the remote environment, given the existing `remote_paths`.  The
+    directories holding at least `threshold` of the notebooks can be imported whole as an
+    archive; the notebooks in any other directory, or directly in an existing one, are
+    returned separately so they can be imported one at a time."""
+
+    existing = _get_existing_directories(remote_paths)
+    prefix = root.rstrip('/') + '/'
+
+    groups = {}
+    for path in paths:
+        top = None
+        directory = os.path.dirname(path)
+
+        while len(directory) > len(prefix) and directory.startswith(prefix) \
+                and directory not in existing:
+            top = directory
+            directory = os.path.dirname(directory)
+
+        groups.setdefault(top, []).append(path)
+
+    archives = {directory: group for directory, group in groups.items()
+                if directory is not None and 0 < threshold <= len(group)}
+    archived = set(chain.from_iterable(archives.values()))
+    remainder = [path for path in paths if path not in archived]
+
+    return archives, remainder
 
-    delta = difflib.unified_diff(remote_job_json.splitlines(keepends=False),
-                                 local_job_json.splitlines(keepends=False),
-                                 tofile=f'local/{job_name}',
-                                 fromfile=f'remote/{job_name}')
 
-    for diff in delta:
-        logging.info(diff)
+def plan_deletes(directories: Iterable[str], notebooks: Iterable[str]):
+    """Returns the remote `directories` and `notebooks` that need deleting themselves, in
+    sorted order.  A recursive delete of a directory removes everything beneath it, so only
+    the topmost of the `directories` are kept, and only the `notebooks` outside all of them.
+    Each path is checked against its own ancestors, so the cost grows with the depth of the
+    path rather than with the number of directories."""
 
+    deleting = set(directories)
 
-def remove_blank_lines(lines: List[str]):
+    def is_covered(path: str):
+        directory = os.path.dirname(path.rstrip('/'))
+
+        while True:
+            if directory in deleting:
+                return True
+
+            if os.path.dirname(directory) == directory:
+                return False
+
+            directory = os.path.dirname(directory)
+
+    return (sorted(d for d in deleting if not is_covered(d)),
+            sorted(n for n in notebooks if not is_covered(n)))
+
+
+def plan_directory_exports(paths: List[str], remote_notebooks: Set[str], root: str,
+                           limit: int = MAX_DIRECTORY_EXPORT_NOTEBOOKS,
+                           exclude: List[str] = None, include: List[str] = None):
+    """Groups the remote notebook `paths` by the remote directory they can be exported
+    with.  Each notebook is assigned to its topmost parent directory, no higher than
+    `root`, that holds no more than `limit` of the `remote_notebooks` and more than one of
+    `paths`, which keeps every planned directory disjoint from the others.  The
+    `remote_notebooks` only count what passed the `exclude` and `include` patterns, so
+    directories that may hold filtered out objects are never exported whole, and neither
+    is the workspace root, whose archive has no folder to unpack from.  Notebooks
+    that no directory qualifies for are returned separately so they can be exported one at
+    a time."""
+
+    root = root.rstrip('/') or '/'
+
+    def parents(path: str):
+        directory = os.path.dirname(path)
+
+        while True:
+            yield directory
+
+            if directory == root or os.path.dirname(directory) == directory:
+                return
+
+            directory = os.path.dirname(directory)
+
+    @lru_cache(maxsize=None)
+    def is_filtered(directory: str):
+        return is_filtered_directory(exclude, include, directory)
+
+    sizes = Counter(chain.from_iterable(map(parents, remote_notebooks)))
+    wanted = Counter(chain.from_iterable(map(parents, paths)))
+
+    exports = {}
+    remainder = []
+
+    for path in paths:
+        for directory in reversed([*parents(path)]):
+            if directory != '/' and sizes[directory] <= limit and wanted[directory] > 1 \
+                    and not is_filtered(directory):
+                exports.setdefault(directory, []).append(path)
+                break
+        else:
+            remainder.append(path)
+
+    return exports, remainder
+
+
+def plan_mkdirs(paths: Iterable[str], remote_paths: Iterable[str]):
+    """Returns the smallest set of directories to create so that the parent directory of
+    each of the notebook `paths` exists.  Directories holding, or above, any of the
+    `remote_paths` already exist, and creating a directory also creates its missing
+    parents, so only the deepest missing directories are returned."""
+
+    missing = {os.path.dirname(path) for path in paths} - _get_existing_directories(remote_paths)
+    covered = {os.path.dirname(directory) for directory in missing}
+
+    # Any missing directory that is an ancestor of another is created along with it.
+    while covered:
+        missing -= covered
+        covered = {os.path.dirname(directory) for directory in covered} - {'/', ''}
+
+    return sorted(missing)
+
+
+def print_job_diff(job_name: str, changes: List[Tuple[str, Any, Any]],
+                   report: DiffReport = None):
+    def _format(value: Any):
+        return '<missing>' if value is MISSING else json.dumps(value, sort_keys=True)
+
+    delta = (f'{path}: {_format(remote)} -> {_format(local)}' for path, remote, local in changes)
+
+    (report or DiffReport()).add('job', job_name, delta)
+
+
+def print_notebook_diff(local: str, remote: str, remote_source: str,
+                        report: DiffReport = None, engine: str = DEFAULT_DIFF_ENGINE):
+    with open(local, 'r') as local_notebook_stream:
+        local_notebook_lines = local_notebook_stream.read().splitlines(False)
+
+    delta = DIFF_ENGINES[engine](remote_source.splitlines(False), local_notebook_lines,
+                                 fromfile=remote, tofile=local, lineterm='')
+
+    (report or DiffReport()).add('notebook', remote, delta)
+
+
+def remove_blank_lines(lines: Iterable[str]):
     for line in lines:
         if line.rstrip():
             yield line
 
 
-def remove_whitespace(lines: List[str]):
-    return list([line.rstrip() for line in lines])
+def remove_whitespace(lines: Iterable[str]):
+    for line in lines:
+        yield line.rstrip()
 
 
 def restart_job(jobs_client: JobsApi, job_id: str, job_name: str, runs_client: RunsApi):
@@ -478,3 +962,8 @@ def stop_job(client: RunsApi, job_id, job_name):
                         'Run ID %s does not exist for %s.', run_id, job_name)
 
                 raise
+
+
+def tag_job_settings(settings: dict):
+    return {**settings, 'tags': {**settings.get('tags', {}),
+                                 JOB_HASH_TAG: get_job_settings_hash(settings)}}
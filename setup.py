@@ -43,7 +43,7 @@ setup(
     packages=find_packages(exclude=['tests', 'tests.*']),
     install_requires=[
         'click>=6.7',
-        'databricks-cli>=0.14.3',
+        'databricks-cli>=0.16.0',
     ],
     entry_points='''
         [console_scripts]
@@ -55,6 +55,20 @@ class TestProvideApi:
         assert result.exit_code == 0
         assert result.output == '1\n'
 
+    def test_jobs_api_version(self):
+        mock_config = DatabricksConfig.from_token('test-host', 'test-token', jobs_api_version='2.1')
+        set_config_provider(MockConfigProvider(mock_config))
+
+        @click.command()
+        @config.profile_option
+        @config.provide_api_client
+        def test_command(api_client): # noqa
+            click.echo(api_client.jobs_api_version)
+
+        result = CliRunner().invoke(test_command, [])
+        assert result.exit_code == 0
+        assert result.output == '2.1\n'
+
 
 TEST_PROFILE_1 = 'test-profile-1'
 TEST_PROFILE_2 = 'test-profile-2'
@@ -0,0 +1,102 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import base64
+import io
+import os
+import zipfile
+
+from pipeline_deploy.databricks.api import WorkspaceClient
+from pytest_mock import MockFixture
+from tests.databricks.utils import FILE_PATH
+
+class TestWorkspaceClient:
+    def test_export_source(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+        target.client.export_workspace.return_value = {
+            'content': base64.b64encode('print("hello")'.encode('utf-8')).decode('ascii')
+        }
+
+        assert target.export_source('/path/foo') == 'print("hello")'
+        target.client.export_workspace.assert_called_once_with('/path/foo', 'SOURCE', headers=None)
+
+    def test_import_archive(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+
+        target.import_archive('/path/new', {
+            'foo.py': os.path.join(FILE_PATH, 'foo.py'),
+            'directory/bar.py': os.path.join(FILE_PATH, 'directory', 'bar.py')
+        })
+
+        path, fmt, language, content, is_overwrite = target.client.import_workspace.call_args.args
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(content))) as archive:
+            names = archive.namelist()
+            source = archive.read('foo.py')
+
+        assert (path, fmt, language, is_overwrite) == ('/path/new', 'SOURCE', None, False)
+        assert names == ['directory/bar.py', 'foo.py']
+        with open(os.path.join(FILE_PATH, 'foo.py'), 'rb') as src:
+            assert source == src.read()
+
+    def test_import_source(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+
+        target.import_source('/path/index.json', '{}')
+
+        target.client.import_workspace.assert_called_once_with(
+            '/path/index.json', 'AUTO', None, base64.b64encode(b'{}').decode('ascii'), True,
+            headers=None)
+
+    def test_list_objects_keeps_the_modification_time(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+        target.client.list.return_value = {
+            'objects': [
+                {'path': '/path/foo', 'object_type': 'NOTEBOOK', 'object_id': 1,
+                 'language': 'PYTHON', 'created_at': 1, 'modified_at': 2},
+                {'path': '/path/directory', 'object_type': 'DIRECTORY', 'object_id': 3},
+            ]
+        }
+
+        actual = target.list_objects('/path')
+
+        assert [(x.path, x.object_id, x.modified_at) for x in actual] == [
+            ('/path/foo', 1, 2),
+            ('/path/directory', 3, None),
+        ]
+        assert actual[1].is_dir
+
+    def test_list_objects_when_the_directory_is_empty(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+        target.client.list.return_value = {}
+
+        assert target.list_objects('/path') == []
+
+    def test_get_status_keeps_the_modification_time(self, mocker: MockFixture):
+        target = WorkspaceClient(mocker.MagicMock())
+        target.client = mocker.MagicMock()
+        target.client.get_status.return_value = {'path': '/path/foo', 'object_type': 'NOTEBOOK',
+                                                 'object_id': 1, 'modified_at': 2}
+
+        actual = target.get_status('/path/foo')
+
+        assert (actual.path, actual.object_id, actual.modified_at) == ('/path/foo', 1, 2)
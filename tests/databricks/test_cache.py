@@ -0,0 +1,303 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import json
+import os
+import requests
+import time
+
+import pytest
+
+from databricks_cli.workspace.api import DIRECTORY, NOTEBOOK
+from pipeline_deploy.databricks.api import RemoteFileInfo
+from pipeline_deploy.databricks.cache import DigestCache, Inventory, Manifest, RemoteManifest
+from pytest_mock import MockFixture
+from requests.exceptions import HTTPError
+from tests.databricks import test_data as data
+
+FILTERS = dict(exclude_jobs=[], exclude_notebooks=[], include_jobs=[], include_notebooks=[],
+               owner=None)
+
+REMOTE_PATHS = [
+    RemoteFileInfo('/remote/path/file-1', NOTEBOOK, '1', 'PYTHON', 1650000000000),
+    RemoteFileInfo('/remote/path/sub-directory', DIRECTORY, '2'),
+    RemoteFileInfo('/remote/path/sub-directory/file-2', NOTEBOOK, '3', 'PYTHON', 1650000000000),
+]
+
+class TestInventory:
+    def test_when_there_is_no_snapshot(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+
+        assert not target.load()
+
+    def test_saving_and_loading_a_snapshot(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, data.JOBS_DATA_REMOTE)
+        target.save()
+
+        actual = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+
+        assert actual.load()
+        assert [vars(x) for x in actual.get_paths()] == [vars(x) for x in REMOTE_PATHS]
+        assert actual.get_jobs() == data.JOBS_DATA_REMOTE
+
+    def test_when_the_snapshot_is_for_another_remote_path(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, data.JOBS_DATA_REMOTE)
+        target.save()
+
+        assert not Inventory('https://host/api/', '/other', FILTERS, 60, str(tmp_path)).load()
+        assert not Inventory('https://other/api/', '/remote/path', FILTERS, 60, str(tmp_path)).load()
+
+    def test_when_the_snapshot_was_built_with_other_filters(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, data.JOBS_DATA_REMOTE)
+        target.save()
+
+        filters = {**FILTERS, 'owner': 'owner@company.com'}
+
+        assert not Inventory('https://host/api/', '/remote/path', filters, 60, str(tmp_path)).load()
+
+    def test_when_the_snapshot_has_expired(self, tmp_path, mocker: MockFixture):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, data.JOBS_DATA_REMOTE)
+        target.save()
+
+        mocker.patch('pipeline_deploy.databricks.cache.time', return_value=target.created_at + 61)
+
+        assert not Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path)).load()
+
+    def test_discarding_a_snapshot(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, data.JOBS_DATA_REMOTE)
+        target.save()
+        target.discard()
+        target.discard()
+
+        assert not os.path.exists(target.path)
+
+    def test_adding_a_path_adds_its_missing_parent_directories(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, [])
+
+        target.add_path('/remote/path/new/nested/file-3', NOTEBOOK, 'PYTHON')
+
+        assert {x.path for x in target.get_paths()} == {
+            '/remote/path/file-1',
+            '/remote/path/sub-directory',
+            '/remote/path/sub-directory/file-2',
+            '/remote/path/new',
+            '/remote/path/new/nested',
+            '/remote/path/new/nested/file-3',
+        }
+
+    def test_removing_a_directory_removes_its_contents(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset(REMOTE_PATHS, [])
+
+        target.remove_path('/remote/path/sub-directory', True)
+
+        assert {x.path for x in target.get_paths()} == {'/remote/path/file-1'}
+
+    def test_setting_and_removing_jobs(self, tmp_path):
+        target = Inventory('https://host/api/', '/remote/path', FILTERS, 60, str(tmp_path))
+        target.reset([], data.JOBS_DATA_REMOTE)
+
+        target.set_job({'job_id': '1', 'settings': {'name': 'job-1', 'max_retries': 1}})
+        target.remove_job('2')
+
+        assert target.get_jobs() == [{'job_id': '1', 'settings': {'name': 'job-1', 'max_retries': 1}}]
+
+class TestManifest:
+    def test_saving_and_loading_a_manifest(self, tmp_path):
+        target = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        target.record(REMOTE_PATHS[0], 'digest')
+        target.save()
+
+        actual = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        actual.load()
+
+        assert actual.is_unchanged(REMOTE_PATHS[0], 'digest')
+
+    def test_when_the_local_notebook_has_changed(self, tmp_path):
+        target = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        target.record(REMOTE_PATHS[0], 'digest')
+
+        assert not target.is_unchanged(REMOTE_PATHS[0], 'other-digest')
+
+    def test_when_the_remote_notebook_has_changed(self, tmp_path):
+        target = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        target.record(REMOTE_PATHS[0], 'digest')
+
+        modified = RemoteFileInfo('/remote/path/file-1', NOTEBOOK, '1', 'PYTHON', 1650000000001)
+        replaced = RemoteFileInfo('/remote/path/file-1', NOTEBOOK, '4', 'PYTHON', 1650000000000)
+
+        assert not target.is_unchanged(modified, 'digest')
+        assert not target.is_unchanged(replaced, 'digest')
+
+    def test_when_the_remote_modification_time_is_unknown(self, tmp_path):
+        target = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        unknown = RemoteFileInfo('/remote/path/file-1', NOTEBOOK, '1', 'PYTHON')
+        target.record(unknown, 'digest')
+
+        assert not target.is_unchanged(unknown, 'digest')
+        assert not target.entries
+
+    def test_removing_a_directory_removes_its_entries(self, tmp_path):
+        target = Manifest('https://host/api/', '/remote/path', str(tmp_path))
+        target.record(REMOTE_PATHS[0], 'digest')
+        target.record(REMOTE_PATHS[2], 'digest')
+
+        target.remove('/remote/path/sub-directory', True)
+
+        assert [*target.entries] == ['/remote/path/file-1']
+
+class TestRemoteManifest:
+    def test_when_there_is_no_index(self, mocker: MockFixture):
+        def mock_export_source(path):
+            response = mocker.MagicMock()
+            response.json = mocker.MagicMock(return_value={'error_code':'RESOURCE_DOES_NOT_EXIST'})
+
+            raise HTTPError(request=requests.Request(), response=response)
+        mock_client = mocker.MagicMock()
+        mock_client.export_source = mocker.MagicMock(side_effect=mock_export_source)
+
+        target = RemoteManifest(mock_client, '/remote/path/')
+        target.load()
+
+        assert target.path == '/remote/path/.pipeline-deploy-index.json'
+        assert not target.entries
+
+    def test_when_the_index_cannot_be_read(self, mocker: MockFixture):
+        def mock_export_source(path):
+            response = mocker.MagicMock()
+            response.json = mocker.MagicMock(return_value={'error_code':'PERMISSION_DENIED'})
+
+            raise HTTPError(request=requests.Request(), response=response)
+        mock_client = mocker.MagicMock()
+        mock_client.export_source = mocker.MagicMock(side_effect=mock_export_source)
+
+        with pytest.raises(HTTPError):
+            RemoteManifest(mock_client, '/remote/path').load()
+
+    def test_saving_and_loading_an_index(self, mocker: MockFixture):
+        files = {}
+        mock_client = mocker.MagicMock()
+        mock_client.export_source = mocker.MagicMock(side_effect=lambda path: files[path])
+        mock_client.import_source = mocker.MagicMock(side_effect=files.__setitem__)
+
+        target = RemoteManifest(mock_client, '/remote/path')
+        target.record(REMOTE_PATHS[0], 'digest')
+        target.save()
+
+        actual = RemoteManifest(mock_client, '/remote/path')
+        actual.load()
+
+        assert actual.is_unchanged(REMOTE_PATHS[0], 'digest')
+        assert mock_client.export_source.call_count == 1
+
+    def test_an_unchanged_index_is_not_rewritten(self, mocker: MockFixture):
+        mock_client = mocker.MagicMock()
+        mock_client.export_source.return_value = json.dumps({
+            'version': RemoteManifest.VERSION,
+            'entries': {'/remote/path/file-1': {'object_id': '1', 'modified_at': 1650000000000,
+                                                'digest': 'digest'}}
+        })
+
+        target = RemoteManifest(mock_client, '/remote/path')
+        target.load()
+        target.record(REMOTE_PATHS[0], 'digest')
+        target.save()
+
+        mock_client.import_source.assert_not_called()
+
+class TestDigestCache:
+    def _write(self, path, content, age=60):
+        path.write_text(content)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def test_unchanged_notebooks_are_not_read_again(self, mocker: MockFixture, tmp_path):
+        notebook = tmp_path / 'foo.py'
+        self._write(notebook, data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+
+        target = DigestCache(str(tmp_path / 'cache'))
+        expected = target.get_digest(str(notebook))
+        target.save()
+
+        mock_get_notebook_digest = mocker.patch('pipeline_deploy.databricks.utils.get_notebook_digest')
+        actual = DigestCache(str(tmp_path / 'cache'))
+        actual.load()
+
+        assert actual.get_digest(str(notebook)) == expected
+        mock_get_notebook_digest.assert_not_called()
+
+    def test_modified_notebooks_are_read_again(self, tmp_path):
+        notebook = tmp_path / 'foo.py'
+        self._write(notebook, data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+
+        target = DigestCache(str(tmp_path / 'cache'))
+        original = target.get_digest(str(notebook))
+
+        self._write(notebook, data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK, age=30)
+
+        assert target.get_digest(str(notebook)) != original
+
+    def test_deleted_notebooks_are_forgotten(self, tmp_path):
+        kept = tmp_path / 'foo.py'
+        deleted = tmp_path / 'bar.py'
+        self._write(kept, data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+        self._write(deleted, data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK)
+
+        target = DigestCache(str(tmp_path / 'cache'))
+        target.get_digest(str(kept))
+        target.get_digest(str(deleted))
+        target.save()
+
+        deleted.unlink()
+        actual = DigestCache(str(tmp_path / 'cache'))
+        actual.load()
+        actual.save()
+
+        reloaded = DigestCache(str(tmp_path / 'cache'))
+        reloaded.load()
+
+        assert list(reloaded.entries) == [os.path.abspath(str(kept))]
+
+    def test_recently_modified_notebooks_are_not_remembered(self, tmp_path):
+        notebook = tmp_path / 'foo.py'
+        notebook.write_text(data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+
+        target = DigestCache(str(tmp_path / 'cache'))
+        target.get_digest(str(notebook))
+
+        assert not target.entries
+
+    def test_digests_from_another_normaliser_version_are_discarded(self, mocker: MockFixture, tmp_path):
+        notebook = tmp_path / 'foo.py'
+        self._write(notebook, data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+
+        target = DigestCache(str(tmp_path / 'cache'))
+        target.get_digest(str(notebook))
+        target.save()
+
+        mocker.patch('pipeline_deploy.databricks.utils.NORMALISER_VERSION', -1)
+        actual = DigestCache(str(tmp_path / 'cache'))
+        actual.load()
+
+        assert not actual.entries
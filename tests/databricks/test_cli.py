@@ -21,6 +21,7 @@ import pytest
 
 from click.testing import CliRunner
 from databricks_cli.configure.provider import DatabricksConfig, set_config_provider
+from databricks_cli.jobs.api import JobsApi
 from databricks_cli.workspace.api import DIRECTORY, NOTEBOOK, WorkspaceFileInfo
 from pipeline_deploy.databricks.cli import databricks_cli
 from pytest_mock.plugin import MockerFixture
@@ -84,8 +85,11 @@ class TestCli:
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -140,13 +144,16 @@ class TestCli:
             '/remote/path/sub-directory/file-2'
         }
 
-        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [expected_exclude_jobs], [], None)
+        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [expected_exclude_jobs], [], None, version=None, trust_creator=False)
         mock_enumerate_local_jobs.assert_called_with([expected_exclude_jobs], [], FILE_PATH, None)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -203,12 +210,15 @@ class TestCli:
 
         mock_enumerate_local_directories.assert_called_with([expected_exclude_notebooks], [], FILE_PATH)
         mock_get_local_notebooks_map.assert_called_with([expected_exclude_notebooks], [], FILE_PATH, '/')
-        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [expected_exclude_notebooks], [], '/')
+        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [expected_exclude_notebooks], [], '/', 8)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -265,8 +275,11 @@ class TestCli:
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -321,13 +334,16 @@ class TestCli:
             '/remote/path/sub-directory/file-2'
         }
 
-        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [], [expected_include_jobs], None)
+        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [], [expected_include_jobs], None, version=None, trust_creator=False)
         mock_enumerate_local_jobs.assert_called_with([], [expected_include_jobs], FILE_PATH, None)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -384,12 +400,15 @@ class TestCli:
 
         mock_enumerate_local_directories.assert_called_with([], [expected_include_notebooks], FILE_PATH)
         mock_get_local_notebooks_map.assert_called_with([], [expected_include_notebooks], FILE_PATH, '/')
-        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [], [expected_include_notebooks], '/')
+        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [], [expected_include_notebooks], '/', 8)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -444,12 +463,15 @@ class TestCli:
             '/remote/path/sub-directory/file-2'
         }
 
-        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [], [], expected_owner)
+        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [], [], expected_owner, version=None, trust_creator=False)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -508,8 +530,11 @@ class TestCli:
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -565,12 +590,15 @@ class TestCli:
         }
 
         mock_get_local_notebooks_map.assert_called_with([], [], FILE_PATH, expected_remote_path)
-        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [], [], expected_remote_path)
+        mock_enumerate_remote_paths.assert_called_with(mocker.ANY, [], [], expected_remote_path, 8)
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -625,8 +653,11 @@ class TestCli:
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -671,7 +702,7 @@ class TestCli:
         mock_enumerate_remote_jobs.return_value = JOBS_DATA_REMOTE
         expected_remote_jobs_map = {job['settings']['name']: job for job in JOBS_DATA_REMOTE}
 
-        def mock_notebooks_update(local_notebooks_map, remote_streaming_jobs_map, remote_notebooks):
+        def mock_notebooks_update(local_notebooks_map, remote_streaming_jobs_map, remote_notebooks, remote_objects):
             yield 'Job 1', '1'
         notebooks_controller_mock.update.side_effect = mock_notebooks_update
         def mock_jobs_update(local_jobs_map, remote_jobs_map):
@@ -691,8 +722,11 @@ class TestCli:
 
         notebooks_controller_mock.update.assert_called_with(expected_local_notebooks_map,
                                                             {'/path/notebooks/streaming-job-1': [JOBS_DATA_REMOTE[1]]},
-                                                            expected_remote_notebooks)
-        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks)
+                                                            expected_remote_notebooks,
+                                                            {'/remote/path/file-1': remote_paths[0],
+                                                             '/remote/path/sub-directory/file-2': remote_paths[2]})
+        notebooks_controller_mock.create.assert_called_with(expected_local_notebooks_map, expected_remote_notebooks,
+                                                                    {'/remote/path/sub-directory'})
         notebooks_controller_mock.delete.assert_called_with(expected_local_directories,
                                                             expected_local_notebooks_map,
                                                             {'/remote/path/sub-directory'},
@@ -705,3 +739,116 @@ class TestCli:
         jobs_controller_mock.delete.assert_called_with(expected_local_jobs_map,
                                                        expected_remote_jobs_map)
         jobs_controller_mock.restart.assert_called_with({ '1': 'Job 1' })
+
+    def test_databricks_cli_with_a_cached_inventory(self, jobs_controller_mock: MagicMock, notebooks_controller_mock: MagicMock, mocker: MockerFixture, monkeypatch, tmp_path):
+        monkeypatch.chdir(tmp_path)
+        mock_config = DatabricksConfig.from_token('test-host', 'test-token')
+        set_config_provider(MockConfigProvider(mock_config))
+
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_directories').return_value = []
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_jobs').return_value = JOBS_DATA_LOCAL
+        mocker.patch('pipeline_deploy.databricks.utils.get_local_notebooks_map').return_value = {}
+
+        mock_enumerate_remote_paths = mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_paths')
+        mock_enumerate_remote_paths.return_value = [
+            WorkspaceFileInfo('/remote/path/file-1', NOTEBOOK, '1'),
+        ]
+
+        mock_enumerate_remote_jobs = mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_jobs')
+        mock_enumerate_remote_jobs.return_value = JOBS_DATA_REMOTE
+        expected_remote_jobs_map = {job['settings']['name']: job for job in JOBS_DATA_REMOTE}
+
+        runner = CliRunner()
+        args = ['--jobs-dir', FILE_PATH, '--notebooks-dir', FILE_PATH, '--inventory-ttl', '60']
+
+        runner.invoke(databricks_cli, args, catch_exceptions=False)
+        runner.invoke(databricks_cli, args, catch_exceptions=False)
+
+        assert mock_enumerate_remote_paths.call_count == 1
+        assert mock_enumerate_remote_jobs.call_count == 1
+
+        runner.invoke(databricks_cli, [*args, '--refresh-inventory'], catch_exceptions=False)
+
+        assert mock_enumerate_remote_paths.call_count == 2
+        assert mock_enumerate_remote_jobs.call_count == 2
+
+        notebooks_controller_mock.create.assert_called_with({}, {'/remote/path/file-1'}, set())
+        jobs_controller_mock.update.assert_called_with(mocker.ANY, expected_remote_jobs_map)
+
+    def test_databricks_cli_with_a_hash_index(self, jobs_controller_mock: MagicMock, notebooks_controller_mock: MagicMock, mocker: MockerFixture):
+        mock_config = DatabricksConfig.from_token('test-host', 'test-token')
+        set_config_provider(MockConfigProvider(mock_config))
+
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_directories').return_value = []
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_jobs').return_value = JOBS_DATA_LOCAL
+        mocker.patch('pipeline_deploy.databricks.utils.get_local_notebooks_map').return_value = {}
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_jobs').return_value = JOBS_DATA_REMOTE
+
+        mock_enumerate_remote_paths = mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_paths')
+        mock_enumerate_remote_paths.return_value = [
+            WorkspaceFileInfo('/remote/path/.pipeline-deploy-index.json', 'FILE', '1'),
+            WorkspaceFileInfo('/remote/path/file-1', NOTEBOOK, '2'),
+        ]
+
+        mock_remote_manifest = mocker.patch('pipeline_deploy.databricks.cli.RemoteManifest')
+
+        runner = CliRunner()
+        runner.invoke(databricks_cli, ['--jobs-dir', FILE_PATH, '--notebooks-dir', FILE_PATH,
+                                       '--remote-path', '/remote/path', '--hash-index'],
+                      catch_exceptions=False)
+
+        mock_remote_manifest.return_value.load.assert_called_once_with()
+        mock_remote_manifest.return_value.save.assert_called_once_with()
+        notebooks_controller_mock.create.assert_called_with({}, {'/remote/path/file-1'}, set())
+
+    def test_databricks_cli_with_the_jobs_api_version_of_the_profile(self, jobs_controller_mock: MagicMock, mocker: MockerFixture):
+        mock_config = DatabricksConfig.from_token('test-host', 'test-token', jobs_api_version='2.1')
+        set_config_provider(MockConfigProvider(mock_config))
+
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_directories').return_value = []
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_jobs').return_value = JOBS_DATA_LOCAL
+        mocker.patch('pipeline_deploy.databricks.utils.get_local_notebooks_map').return_value = {}
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_paths').return_value = []
+
+        mock_notebooks_controller = mocker.patch('pipeline_deploy.databricks.cli.NotebooksController')
+        mock_notebooks_controller.side_effect = lambda api_client, *args: MagicMock(jobs_client=JobsApi(api_client))
+
+        def request(method, url, **kwargs):
+            response = MagicMock()
+            if url.endswith('/jobs/list'):
+                response.json.return_value = {'jobs': [{'job_id': '1'}], 'has_more': False}
+            else:
+                response.json.return_value = JOBS_DATA_REMOTE[0]
+            return response
+
+        mock_request = mocker.patch('requests.Session.request', side_effect=request)
+
+        runner = CliRunner()
+        runner.invoke(databricks_cli, ['--jobs-dir', FILE_PATH, '--notebooks-dir', FILE_PATH],
+                      catch_exceptions=False)
+
+        urls = [call.args[1] for call in mock_request.call_args_list]
+        assert [url[url.index('/api/'):] for url in urls] == ['/api/2.1/jobs/list', '/api/2.1/jobs/get']
+        jobs_controller_mock.update.assert_called_with(mocker.ANY, {'job-1': JOBS_DATA_REMOTE[0]})
+
+    def test_databricks_cli_with_jobs_api_version(self, notebooks_controller_mock: MagicMock, mocker: MockerFixture):
+        mock_config = DatabricksConfig.from_token('test-host', 'test-token', jobs_api_version='2.0')
+        set_config_provider(MockConfigProvider(mock_config))
+
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_directories').return_value = []
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_jobs').return_value = JOBS_DATA_LOCAL
+        mocker.patch('pipeline_deploy.databricks.utils.get_local_notebooks_map').return_value = {}
+        mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_paths').return_value = []
+
+        mock_enumerate_remote_jobs = mocker.patch('pipeline_deploy.databricks.utils.enumerate_remote_jobs')
+        mock_enumerate_remote_jobs.return_value = JOBS_DATA_REMOTE
+
+        mock_jobs_controller = mocker.patch('pipeline_deploy.databricks.cli.JobsController')
+
+        runner = CliRunner()
+        runner.invoke(databricks_cli, ['--jobs-dir', FILE_PATH, '--notebooks-dir', FILE_PATH,
+                                       '--jobs-api-version', '2.1'],
+                      catch_exceptions=False)
+
+        mock_enumerate_remote_jobs.assert_called_with(mocker.ANY, [], [], None, version='2.1', trust_creator=False)
+        assert mock_jobs_controller.call_args.args[0].jobs_api_version == '2.1'
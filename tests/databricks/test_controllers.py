@@ -16,9 +16,18 @@ limitations under the License.
 SPDX-License-Identifier: Apache-2.0
 """
 
+import logging
 import os
+import threading
+import time
+
+import pytest
 
 from pytest_mock.plugin import MockerFixture
+from requests.exceptions import HTTPError
+from pipeline_deploy.databricks import utils
+from pipeline_deploy.databricks.api import RemoteFileInfo
+from pipeline_deploy.databricks.cache import Manifest
 from pipeline_deploy.databricks.controllers import JobsController, NotebooksController
 from tests.databricks.utils import FILE_PATH
 from tests.databricks import test_data as data
@@ -211,6 +220,43 @@ class TestJobsController:
 
         mock_jobs_client.delete_job.assert_not_called()
 
+    def test_create_summarises_failed_jobs(self, mocker: MockerFixture, caplog):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+        def mock_create_job(config):
+            if config['name'] == 'job-1':
+                raise HTTPError('Unable to create.')
+
+            return {'job_id': config['name']}
+        mock_jobs_client.create_job.side_effect = mock_create_job
+
+        target = JobsController(mock_api_client, False, False)
+        target.jobs_client = mock_jobs_client
+
+        local_jobs_map = {f'job-{i}': {'name': f'job-{i}'} for i in range(3)}
+
+        with pytest.raises(RuntimeError, match='Unable to create 1 of 3 jobs: job-1'):
+            list(target.create(local_jobs_map, {}, None))
+
+        assert mock_jobs_client.create_job.call_count == 3
+        assert 'Unable to create "job-1"' in caplog.text
+
+    def test_delete_deletes_jobs_concurrently(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+        barrier = threading.Barrier(3, timeout=5)
+        mock_jobs_client.delete_job.side_effect = lambda job_id: barrier.wait()
+
+        target = JobsController(mock_api_client, False, False, job_concurrency=3)
+        target.jobs_client = mock_jobs_client
+
+        remote_jobs_map = {f'job-{i}': {'job_id': i, 'settings': {'name': f'job-{i}'}}
+                           for i in range(3)}
+
+        target.delete({}, remote_jobs_map)
+
+        assert mock_jobs_client.delete_job.call_count == 3
+
     def test_delete_when_there_are_streaming_jobs_that_require_deletion(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
         mock_jobs_client = mocker.MagicMock()
@@ -228,6 +274,23 @@ class TestJobsController:
         for job in data.LIST_STREAMING_JOBS_OWNED['jobs']:
             mock_jobs_client.delete_job.assert_any_call(job['job_id'])
 
+    def test_delete_writes_through_to_the_inventory(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+        mock_inventory = mocker.MagicMock()
+
+        target = JobsController(mock_api_client, False, False, inventory=mock_inventory)
+        target.jobs_client = mock_jobs_client
+
+        local_jobs_map = dict()
+        remote_jobs_map = dict((job['settings']['name'], job)
+                               for job in data.LIST_JOBS_OWNED['jobs'])
+
+        target.delete(local_jobs_map, remote_jobs_map)
+
+        for job in data.LIST_JOBS_OWNED['jobs']:
+            mock_inventory.remove_job.assert_any_call(job['job_id'])
+
     def test_restart_when_there_are_no_jobs_to_restart(self, mocker: MockerFixture):
         mock_restart_job = mocker.patch('pipeline_deploy.databricks.utils.restart_job')
         mock_api_client = mocker.MagicMock()
@@ -370,6 +433,94 @@ class TestJobsController:
 
         assert ('Job 1', '1') in actual
 
+    def test_update_ignores_server_defaults_and_ordering(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+
+        target = JobsController(mock_api_client, False, False)
+        target.jobs_client = mock_jobs_client
+
+        local_jobs_map = {
+            'Job 1': {'name': 'Job 1', 'max_retries': -1,
+                      'tasks': [{'task_key': 'a'}, {'task_key': 'b'}]}
+        }
+        remote_jobs_map = {
+            'Job 1': {'job_id': '1', 'settings': {
+                'name': 'Job 1', 'max_retries': -1, 'email_notifications': {},
+                'format': 'MULTI_TASK', 'max_concurrent_runs': 1, 'timeout_seconds': 0,
+                'tasks': [{'task_key': 'b', 'timeout_seconds': 0}, {'task_key': 'a'}]
+            }}
+        }
+
+        actual = list(target.update(local_jobs_map, remote_jobs_map))
+
+        mock_jobs_client.reset_job.assert_not_called()
+        assert not actual
+
+    def test_create_tags_jobs_with_their_settings_hash(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+        mock_jobs_client.create_job.return_value = {'job_id': '4'}
+
+        target = JobsController(mock_api_client, False, False, hash_tag=True)
+        target.jobs_client = mock_jobs_client
+
+        local = {'name': 'Job 4'}
+        list(target.create({'Job 4': local}, {}, None))
+
+        mock_jobs_client.create_job.assert_called_once_with(utils.tag_job_settings(local))
+
+    def test_update_trusts_a_hash_tag_that_matches_the_settings(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+        mock_diff_job_settings = mocker.patch('pipeline_deploy.databricks.utils.diff_job_settings')
+
+        target = JobsController(mock_api_client, False, False, hash_tag=True)
+        target.jobs_client = mock_jobs_client
+
+        local = {'name': 'Job 1', 'max_retries': -1}
+        remote_jobs_map = {'Job 1': {'job_id': '1', 'settings': utils.tag_job_settings(local)}}
+
+        actual = list(target.update({'Job 1': local}, remote_jobs_map))
+
+        mock_diff_job_settings.assert_not_called()
+        mock_jobs_client.reset_job.assert_not_called()
+        assert not actual
+
+    def test_update_detects_drift_from_the_hash_tag(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+
+        target = JobsController(mock_api_client, False, False, hash_tag=True)
+        target.jobs_client = mock_jobs_client
+
+        local = {'name': 'Job 1', 'max_retries': -1}
+        remote = {**utils.tag_job_settings(local), 'max_retries': 3}
+
+        actual = list(target.update({'Job 1': local}, {'Job 1': {'job_id': '1', 'settings': remote}}))
+
+        mock_jobs_client.reset_job.assert_called_once_with({
+            'job_id': '1', 'new_settings': utils.tag_job_settings(local)
+        })
+        assert actual == [('Job 1', '1')]
+
+    def test_update_resets_jobs_with_a_stale_hash_tag(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_jobs_client = mocker.MagicMock()
+
+        target = JobsController(mock_api_client, False, False, hash_tag=True)
+        target.jobs_client = mock_jobs_client
+
+        local = {'name': 'Job 1', 'max_retries': -1}
+        remote = utils.tag_job_settings({**local, 'max_retries': 3})
+
+        actual = list(target.update({'Job 1': local}, {'Job 1': {'job_id': '1', 'settings': remote}}))
+
+        mock_jobs_client.reset_job.assert_called_once_with({
+            'job_id': '1', 'new_settings': utils.tag_job_settings(local)
+        })
+        assert actual == [('Job 1', '1')]
+
 class TestNotebooksController:
     def test_create_when_there_are_no_notebooks_that_require_creation(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
@@ -426,6 +577,108 @@ class TestNotebooksController:
             True
         )
 
+    def test_create_makes_each_missing_directory_once(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {remote: os.path.join(FILE_PATH, 'foo.py') for remote in [
+            '/path/notebooks/existing/1', '/path/notebooks/new/2', '/path/notebooks/new/3',
+            '/path/notebooks/new/nested/4'
+        ]}
+
+        target.create(local_notebooks_map, {'/path/notebooks/5'}, {'/path/notebooks/existing'})
+
+        mock_workspace_client.mkdirs.assert_called_once_with('/path/notebooks/new/nested')
+        assert mock_workspace_client.import_workspace.call_count == 4
+
+    def test_create_imports_new_directories_as_archives(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_inventory = mocker.MagicMock()
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     mock_inventory, archive_threshold=2)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/1': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/new/2': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/new/nested/3': os.path.join(FILE_PATH, 'directory', 'bar.py')
+        }
+
+        target.create(local_notebooks_map, set())
+
+        mock_workspace_client.mkdirs.assert_called_once_with('/path/notebooks')
+        mock_workspace_client.import_archive.assert_called_once_with('/path/notebooks/new', {
+            '2.py': os.path.join(FILE_PATH, 'foo.py'),
+            'nested/3.py': os.path.join(FILE_PATH, 'directory', 'bar.py')
+        })
+        mock_workspace_client.import_workspace.assert_called_once_with(
+            os.path.join(FILE_PATH, 'foo.py'), '/path/notebooks/1', 'PYTHON', 'SOURCE', True)
+        mock_inventory.add_path.assert_any_call('/path/notebooks/new/nested/3', 'NOTEBOOK',
+                                                'PYTHON')
+
+    def test_create_falls_back_when_an_archive_directory_already_exists(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_response = mocker.MagicMock()
+        mock_response.json.return_value = {'error_code': 'RESOURCE_ALREADY_EXISTS'}
+        mock_workspace_client.import_archive.side_effect = HTTPError(response=mock_response)
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     archive_threshold=2)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/new/2': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/new/nested/3': os.path.join(FILE_PATH, 'directory', 'bar.py')
+        }
+
+        target.create(local_notebooks_map, {'/path/notebooks/1'})
+
+        mock_workspace_client.mkdirs.assert_called_once_with('/path/notebooks/new/nested')
+        assert [call.args[1] for call in mock_workspace_client.import_workspace.call_args_list] == [
+            '/path/notebooks/new/2', '/path/notebooks/new/nested/3'
+        ]
+
+    def test_create_writes_through_to_the_inventory(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_inventory = mocker.MagicMock()
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     mock_inventory)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/foo': os.path.join(FILE_PATH, 'foo.py')
+        }
+        remote_notebooks = set()
+
+        target.create(local_notebooks_map, remote_notebooks)
+
+        mock_inventory.add_path.assert_called_with('/path/notebooks/foo', 'NOTEBOOK', 'PYTHON')
+
+    def test_create_imports_notebooks_concurrently(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        barrier = threading.Barrier(3, timeout=5)
+        mock_workspace_client.import_workspace.side_effect = lambda *args: barrier.wait()
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     import_concurrency=3)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {f'/path/notebooks/job-{i}': os.path.join(FILE_PATH, 'foo.py')
+                               for i in range(3)}
+
+        target.create(local_notebooks_map, set())
+
+        assert mock_workspace_client.import_workspace.call_count == 3
+
     def test_delete_when_there_are_no_directories_or_notebooks_that_require_deletion(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
         mock_workspace_client = mocker.MagicMock()
@@ -483,11 +736,32 @@ class TestNotebooksController:
 
         mock_workspace_client.delete.assert_called_with('/path/notebooks/directory/to-delete', True)
 
+    def test_delete_only_deletes_the_topmost_directories(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
+        target.workspace_client = mock_workspace_client
+
+        remote_directories = {'/path/notebooks/old', '/path/notebooks/old/nested',
+                              '/path/notebooks/old/nested/deeper'}
+        remote_notebooks = {'/path/notebooks/old/nested/deeper/1', '/path/notebooks/old/2',
+                            '/path/notebooks/3'}
+
+        target.delete(set(), {}, remote_directories, remote_notebooks)
+
+        assert mock_workspace_client.delete.call_args_list == [
+            mocker.call('/path/notebooks/old', True),
+            mocker.call('/path/notebooks/3', False)
+        ]
+
     def test_update_when_there_are_no_notebooks_requiring_changes(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
         mock_workspace_client = mocker.MagicMock()
-        mock_is_notebook_updated = mocker.patch('pipeline_deploy.databricks.utils.is_notebook_updated')
-        mock_is_notebook_updated.return_value = False
+        mock_workspace_client.export_source.side_effect = {
+            '/path/notebooks/job-1': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            '/path/notebooks/streaming-job-1': ''
+        }.get
         target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
         target.workspace_client = mock_workspace_client
 
@@ -507,8 +781,7 @@ class TestNotebooksController:
     def test_update_when_there_are_notebooks_requiring_changes_and_its_a_dry_run(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
         mock_workspace_client = mocker.MagicMock()
-        mock_is_notebook_updated = mocker.patch('pipeline_deploy.databricks.utils.is_notebook_updated')
-        mock_is_notebook_updated.return_value = True
+        mock_workspace_client.export_source.return_value = data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK
         target = NotebooksController(mock_api_client, False, True, FILE_PATH, '/path/notebooks')
         target.workspace_client = mock_workspace_client
 
@@ -528,12 +801,10 @@ class TestNotebooksController:
     def test_update_when_there_are_notebooks_requiring_changes_and_the_notebooks_are_not_streaming(self, mocker: MockerFixture):
         mock_api_client = mocker.MagicMock()
         mock_workspace_client = mocker.MagicMock()
-        mock_is_notebook_updated = mocker.patch('pipeline_deploy.databricks.utils.is_notebook_updated')
-        def mock_is_notebook_updated_side_effect(client, diff, local, remote):
-            if remote == '/path/notebooks/job-1':
-                return True
-            return False
-        mock_is_notebook_updated.side_effect = mock_is_notebook_updated_side_effect
+        mock_workspace_client.export_source.side_effect = {
+            '/path/notebooks/job-1': data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK,
+            '/path/notebooks/streaming-job-1': ''
+        }.get
         target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
         target.workspace_client = mock_workspace_client
 
@@ -557,12 +828,10 @@ class TestNotebooksController:
         mock_jobs_client = mocker.MagicMock()
         mock_runs_client = mocker.MagicMock()
         mock_workspace_client = mocker.MagicMock()
-        mock_is_notebook_updated = mocker.patch('pipeline_deploy.databricks.utils.is_notebook_updated')
-        def mock_is_notebook_updated_side_effect(client, diff, local, remote):
-            if remote == '/path/notebooks/job-1':
-                return False
-            return True
-        mock_is_notebook_updated.side_effect = mock_is_notebook_updated_side_effect
+        mock_workspace_client.export_source.side_effect = {
+            '/path/notebooks/job-1': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            '/path/notebooks/streaming-job-1': data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK
+        }.get
         target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
         target.workspace_client = mock_workspace_client
         target.jobs_client = mock_jobs_client
@@ -581,3 +850,177 @@ class TestNotebooksController:
                                                                   '/path/notebooks/streaming-job-1',
                                                                   'PYTHON', 'SOURCE', True)
         assert ('streaming-job-1', '2') in actual
+
+    def test_update_with_bulk_export(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_export_directory = mocker.patch('pipeline_deploy.databricks.utils.export_directory')
+        mock_export_directory.return_value = {
+            '/path/notebooks/job-1': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            '/path/notebooks/streaming-job-1': data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK,
+        }
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     bulk_export=True)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/job-1': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/streaming-job-1': os.path.join(FILE_PATH, 'foo.py')
+        }
+        remote_streaming_jobs_map = {'/path/notebooks/streaming-job-1': [data.JOBS_DATA_REMOTE[1]]}
+        remote_notebooks = {'/path/notebooks/job-1', '/path/notebooks/streaming-job-1'}
+
+        actual = list(target.update(local_notebooks_map, remote_streaming_jobs_map, remote_notebooks))
+
+        mock_export_directory.assert_called_once_with(mock_workspace_client, '/path/notebooks')
+        mock_workspace_client.export_source.assert_not_called()
+        mock_workspace_client.import_workspace.assert_called_once_with(os.path.join(FILE_PATH, 'foo.py'),
+                                                                       '/path/notebooks/streaming-job-1',
+                                                                       'PYTHON', 'SOURCE', True)
+        assert actual == [('streaming-job-1', '2')]
+
+    def test_update_with_bulk_export_when_the_directory_is_too_large(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_export_directory = mocker.patch('pipeline_deploy.databricks.utils.export_directory')
+        mock_export_directory.side_effect = HTTPError(response=mocker.MagicMock())
+        mock_workspace_client.export_source.return_value = data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     bulk_export=True)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/job-1': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/streaming-job-1': os.path.join(FILE_PATH, 'foo.py')
+        }
+        remote_notebooks = {'/path/notebooks/job-1', '/path/notebooks/streaming-job-1'}
+
+        actual = list(target.update(local_notebooks_map, {}, remote_notebooks))
+
+        assert mock_workspace_client.export_source.call_count == 2
+        assert not actual
+
+    def test_update_skips_notebooks_unchanged_since_the_last_deployment(self, mocker: MockerFixture, tmp_path):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_workspace_client.export_source.side_effect = {
+            '/path/notebooks/job-1': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            '/path/notebooks/streaming-job-1': ''
+        }.get
+        manifest = Manifest('https://host/api/', '/path/notebooks', str(tmp_path))
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     manifest=manifest)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {
+            '/path/notebooks/job-1': os.path.join(FILE_PATH, 'foo.py'),
+            '/path/notebooks/streaming-job-1': os.path.join(FILE_PATH, 'directory', 'bar.py')
+        }
+        remote_notebooks = {'/path/notebooks/job-1', '/path/notebooks/streaming-job-1'}
+        remote_objects = {
+            '/path/notebooks/job-1': RemoteFileInfo('/path/notebooks/job-1', 'NOTEBOOK', 1, 'PYTHON', 10),
+            '/path/notebooks/streaming-job-1': RemoteFileInfo('/path/notebooks/streaming-job-1', 'NOTEBOOK', 2, 'PYTHON', 10)
+        }
+
+        list(target.update(local_notebooks_map, {}, remote_notebooks, remote_objects))
+        assert mock_workspace_client.export_source.call_count == 2
+
+        list(target.update(local_notebooks_map, {}, remote_notebooks, remote_objects))
+        assert mock_workspace_client.export_source.call_count == 2
+
+        remote_objects['/path/notebooks/job-1'] = RemoteFileInfo('/path/notebooks/job-1', 'NOTEBOOK', 1, 'PYTHON', 11)
+
+        list(target.update(local_notebooks_map, {}, remote_notebooks, remote_objects))
+        mock_workspace_client.export_source.assert_called_with('/path/notebooks/job-1')
+        assert mock_workspace_client.export_source.call_count == 3
+
+    def test_update_records_imported_notebooks_in_the_manifest(self, mocker: MockerFixture, tmp_path):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_workspace_client.get_status.return_value = RemoteFileInfo('/path/notebooks/job-1', 'NOTEBOOK', 1, 'PYTHON', 11)
+        mock_workspace_client.export_source.return_value = data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK
+        manifest = Manifest('https://host/api/', '/path/notebooks', str(tmp_path))
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     manifest=manifest)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {'/path/notebooks/job-1': os.path.join(FILE_PATH, 'foo.py')}
+        remote_notebooks = {'/path/notebooks/job-1'}
+        remote_objects = {
+            '/path/notebooks/job-1': RemoteFileInfo('/path/notebooks/job-1', 'NOTEBOOK', 1, 'PYTHON', 10)
+        }
+
+        list(target.update(local_notebooks_map, {}, remote_notebooks, remote_objects))
+
+        mock_workspace_client.get_status.assert_called_once_with('/path/notebooks/job-1')
+        assert manifest.is_unchanged(mock_workspace_client.get_status.return_value,
+                                     utils.get_notebook_digest(os.path.join(FILE_PATH, 'foo.py')))
+
+    def test_update_compares_notebooks_concurrently_and_logs_in_order(self, mocker: MockerFixture, caplog):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        barrier = threading.Barrier(3, timeout=5)
+        def mock_export_source(remote):
+            barrier.wait()
+            # Finish in the reverse of the sorted order.
+            time.sleep(0.01 * (3 - int(remote[-1])))
+            return data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK
+        mock_workspace_client.export_source.side_effect = mock_export_source
+        target = NotebooksController(mock_api_client, True, False, FILE_PATH, '/path/notebooks',
+                                     compare_workers=3)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {f'/path/notebooks/job-{i}': os.path.join(FILE_PATH, 'foo.py')
+                               for i in range(3)}
+
+        with caplog.at_level(logging.INFO):
+            list(target.update(local_notebooks_map, {}, set(local_notebooks_map)))
+
+        detected = [r.args[0] for r in caplog.records if r.msg.startswith('Changes detected')]
+        updated = [call.args[1] for call in mock_workspace_client.import_workspace.call_args_list]
+        expected = ['/path/notebooks/job-0', '/path/notebooks/job-1', '/path/notebooks/job-2']
+
+        assert detected == expected
+        assert sorted(updated) == expected
+
+    def test_update_summarises_failed_imports(self, mocker: MockerFixture, caplog):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_workspace_client.export_source.return_value = data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK
+
+        def mock_import_workspace(local, remote, *args):
+            if remote.endswith('job-1'):
+                raise HTTPError('Unable to import.')
+        mock_workspace_client.import_workspace.side_effect = mock_import_workspace
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks')
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {f'/path/notebooks/job-{i}': os.path.join(FILE_PATH, 'foo.py')
+                               for i in range(3)}
+
+        with pytest.raises(RuntimeError, match='1 of 3 notebooks could not be imported: '
+                                               '/path/notebooks/job-1'):
+            list(target.update(local_notebooks_map, {}, set(local_notebooks_map)))
+
+        assert mock_workspace_client.import_workspace.call_count == 3
+        assert 'Unable to import "/path/notebooks/job-1"' in caplog.text
+
+    def test_update_uses_cached_local_digests(self, mocker: MockerFixture):
+        mock_api_client = mocker.MagicMock()
+        mock_workspace_client = mocker.MagicMock()
+        mock_workspace_client.export_source.return_value = data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK
+        mock_digest_cache = mocker.MagicMock()
+        mock_digest_cache.get_digest.return_value = utils.get_source_digest(data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+        mock_open = mocker.patch('builtins.open')
+        target = NotebooksController(mock_api_client, False, False, FILE_PATH, '/path/notebooks',
+                                     digest_cache=mock_digest_cache)
+        target.workspace_client = mock_workspace_client
+
+        local_notebooks_map = {'/path/notebooks/job-1': os.path.join(FILE_PATH, 'foo.py')}
+
+        actual = list(target.update(local_notebooks_map, {}, {'/path/notebooks/job-1'}))
+
+        mock_digest_cache.get_digest.assert_called_once_with(os.path.join(FILE_PATH, 'foo.py'))
+        mock_open.assert_not_called()
+        mock_workspace_client.import_workspace.assert_not_called()
+        assert not actual
@@ -0,0 +1,100 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+
+import difflib
+import random
+import time
+
+import pytest
+
+from pipeline_deploy.databricks.diff import PatienceMatcher, patience_unified_diff
+
+def apply_opcodes(a, b, opcodes):
+    """Rebuilds `b` from `a` and the opcodes, checking that they cover both sides in order."""
+    actual = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            actual.extend(a[i1:i2])
+        else:
+            actual.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return actual
+
+def repetitive_notebook(size):
+    lines = []
+    for i in range(size // 8):
+        lines += ['# COMMAND ----------', '', 'import os', f'x_{i} = {i}', 'print(x)', '', '#', '']
+    return lines
+
+class TestPatienceMatcher:
+    def test_the_opcodes_describe_the_change(self):
+        random.seed(0)
+
+        for _ in range(500):
+            a = random.choices('abcde', k=random.randint(0, 20))
+            b = random.choices('abcde', k=random.randint(0, 20))
+
+            assert apply_opcodes(a, b, PatienceMatcher(a, b).get_opcodes()) == b
+
+    def test_when_the_sequences_are_equal(self):
+        assert PatienceMatcher(['a', 'b'], ['a', 'b']).get_opcodes() == [('equal', 0, 2, 0, 2)]
+
+    def test_when_the_sequences_have_nothing_in_common(self):
+        assert PatienceMatcher(['a'] * 3000, ['b'] * 3000).get_opcodes() == [
+            ('replace', 0, 3000, 0, 3000)
+        ]
+
+class TestPatienceUnifiedDiff:
+    def test_the_output_matches_difflib(self):
+        a = 'one two three four'.split()
+        b = 'zero one tree four'.split()
+
+        assert [*patience_unified_diff(a, b, 'remote', 'local', lineterm='')] == \
+            [*difflib.unified_diff(a, b, 'remote', 'local', lineterm='')]
+
+    def test_the_output_matches_difflib_for_scattered_changes(self):
+        a = [str(i) for i in range(1, 40)]
+        b = a[:]
+        b[8:8] = ['i']
+        b[20] += 'x'
+        b[23:28] = []
+        b[30] += 'y'
+
+        assert [*patience_unified_diff(a, b)] == [*difflib.unified_diff(a, b)]
+
+    def test_when_there_are_no_changes(self):
+        assert not [*patience_unified_diff(['a', 'b'], ['a', 'b'])]
+
+    @pytest.mark.parametrize('changes', [1, 20, 500])
+    def test_benchmark_a_10k_line_notebook_with_heavy_repetition(self, changes):
+        a = repetitive_notebook(10000)
+        b = a[:]
+        for i in range(0, len(b), len(b) // changes):
+            b[i + 3] = f'changed = {i}'
+
+        start = time.perf_counter()
+        delta = [*patience_unified_diff(a, b, lineterm='')]
+        elapsed = time.perf_counter() - start
+
+        assert sum(1 for line in delta if line.startswith('+') and not line.startswith('+++')) == changes
+        assert elapsed < 5
@@ -0,0 +1,71 @@
+"""
+Copyright 2022 Comcast Cable Communications Management, LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+
+import json
+import logging
+
+from pipeline_deploy.databricks.report import DiffReport
+
+DELTA = ['--- remote', '+++ local', '@@ -1 +1 @@', '-old', '+new']
+
+class TestDiffReport:
+    def test_each_difference_is_logged_as_one_record(self, caplog):
+        target = DiffReport()
+
+        with caplog.at_level(logging.INFO):
+            target.add('notebook', '/path/notebooks/foo', iter(DELTA))
+            target.close()
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].getMessage().splitlines()[1:] == DELTA
+
+    def test_long_differences_are_truncated(self, caplog):
+        target = DiffReport(max_lines=2)
+
+        with caplog.at_level(logging.INFO):
+            target.add('job', 'Job 1', iter(DELTA))
+
+        assert caplog.records[0].getMessage().splitlines()[1:] == [
+            '--- remote', '+++ local', '... truncated after 2 lines.'
+        ]
+
+    def test_writing_the_differences_to_a_file(self, tmp_path):
+        path = tmp_path / 'diff.txt'
+        target = DiffReport('file', str(path))
+
+        target.add('notebook', '/path/notebooks/foo', iter(DELTA))
+        target.add('job', 'Job 1', iter(DELTA[:2]))
+        target.close()
+
+        assert path.read_text().splitlines() == [
+            '### notebook /path/notebooks/foo', *DELTA, '',
+            '### job Job 1', *DELTA[:2], ''
+        ]
+
+    def test_writing_the_differences_to_a_json_file(self, tmp_path):
+        path = tmp_path / 'diff.json'
+        target = DiffReport('json', str(path), max_lines=3)
+
+        target.add('notebook', '/path/notebooks/foo', iter(DELTA))
+        target.close()
+
+        assert json.loads(path.read_text()) == {'diffs': [
+            {'type': 'notebook', 'name': '/path/notebooks/foo', 'lines': DELTA[:3],
+             'truncated': True}
+        ]}
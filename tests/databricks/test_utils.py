@@ -16,18 +16,57 @@ limitations under the License.
 SPDX-License-Identifier: Apache-2.0
 """
 
+import base64
+import io
+import json
+import logging
 import os
+import threading
+import zipfile
 import requests
 
 import pytest
 
+from databricks_cli.sdk.api_client import ApiClient
 from databricks_cli.workspace.api import DIRECTORY, NOTEBOOK, WorkspaceFileInfo
 from pipeline_deploy.databricks import utils
+from pipeline_deploy.databricks.api import WorkspaceClient
 from pytest_mock import MockFixture
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 from tests.databricks import test_data as data
 from tests.databricks.utils import FILE_PATH
-from tests.utils import get_mock_export_workspace
+from urllib3.response import HTTPResponse
+
+class TestDiffJobSettings:
+    def test_when_the_settings_are_equal(self):
+        settings = {'name': 'Job 1', 'tasks': [{'task_key': 'a', 'new_cluster': {'num_workers': 4}}]}
+
+        assert not [*utils.diff_job_settings(settings, json.loads(json.dumps(settings)))]
+
+    def test_changes_are_reported_by_path(self):
+        remote = {'name': 'Job 1', 'tasks': [{'task_key': 'a'},
+                                             {'task_key': 'b', 'new_cluster': {'num_workers': 4}}]}
+        local = {'name': 'Job 1', 'tasks': [{'task_key': 'a'},
+                                            {'task_key': 'b', 'new_cluster': {'num_workers': 8}}]}
+
+        assert [*utils.diff_job_settings(remote, local)] == [
+            ('tasks[1].new_cluster.num_workers', 4, 8)
+        ]
+
+    def test_added_and_removed_settings(self):
+        remote = {'name': 'Job 1', 'schedule': {}, 'tags': ['a']}
+        local = {'name': 'Job 1', 'max_retries': -1, 'tags': ['a', 'b'], 'timeout': None}
+
+        assert [*utils.diff_job_settings(remote, local)] == [
+            ('max_retries', utils.MISSING, -1),
+            ('schedule', {}, utils.MISSING),
+            ('tags[1]', utils.MISSING, 'b'),
+            ('timeout', utils.MISSING, None),
+        ]
+
+    def test_a_value_that_changes_type(self):
+        assert [*utils.diff_job_settings({'a': {'b': 1}}, {'a': [1]})] == [('a', {'b': 1}, [1])]
 
 class TestEnumerateLocalDirectories:
     def test_with_no_exclude_and_no_include(self):
@@ -160,6 +199,38 @@ class TestEnumerateRemoteJobs:
 
         assert actual == expected
 
+    def test_jobs_are_built_from_the_list_response(self, mocker: MockFixture):
+        jobs = [{'job_id': str(i), 'settings': {'name': f'Job {i}'}} for i in range(2000)]
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_jobs = mocker.MagicMock(return_value={'jobs': jobs})
+
+        actual = [*utils.enumerate_remote_jobs(mock_client, None, None, None)]
+
+        assert actual == jobs
+        assert mock_client.list_jobs.call_count == 1
+        mock_client.get_job.assert_not_called()
+
+    def test_jobs_missing_fields_from_the_list_response_are_fetched(self, mocker: MockFixture):
+        jobs = [
+            {'job_id': '1', 'settings': {'name': 'Job 1'}},
+            {'job_id': '2'},
+            {'job_id': '3', 'settings': {'name': 'Job 3', 'tasks': []}, 'has_more': True},
+        ]
+        full_jobs = {
+            '2': {'job_id': '2', 'settings': {'name': 'Job 2'}},
+            '3': {'job_id': '3', 'settings': {'name': 'Job 3', 'tasks': [{'task_key': 'a'}]}},
+        }
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_jobs = mocker.MagicMock(return_value={'jobs': jobs})
+        mock_client.get_job = mocker.MagicMock(side_effect=lambda job_id, version: full_jobs[job_id])
+
+        actual = [*utils.enumerate_remote_jobs(mock_client, None, None, None)]
+
+        assert actual == [jobs[0], full_jobs['2'], full_jobs['3']]
+        assert mock_client.get_job.call_count == 2
+
 class TestEnumerateRemotePaths:
     def test_without_include_and_without_exclude(self, mocker: MockFixture):
         mock_root_directory = [
@@ -236,6 +307,133 @@ class TestEnumerateRemotePaths:
 
         assert actual == expected
 
+    def test_sibling_directories_are_listed_concurrently(self, mocker: MockFixture):
+        mock_root_directory = [
+            WorkspaceFileInfo('/remote/path/sub-directory-1', DIRECTORY, '1'),
+            WorkspaceFileInfo('/remote/path/sub-directory-2', DIRECTORY, '2')
+        ]
+
+        mock_sub_directory_1 = [
+            WorkspaceFileInfo('/remote/path/sub-directory-1/file-1', NOTEBOOK, '3'),
+        ]
+
+        mock_sub_directory_2 = [
+            WorkspaceFileInfo('/remote/path/sub-directory-2/file-2', NOTEBOOK, '4'),
+        ]
+
+        # Both sibling listings must be in flight at once for the barrier to release.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def mock_list_objects(path):
+            if path == '/remote/path':
+                return mock_root_directory
+            barrier.wait()
+            if path == '/remote/path/sub-directory-1':
+                return mock_sub_directory_1
+            if path == '/remote/path/sub-directory-2':
+                return mock_sub_directory_2
+            return []
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_objects = mocker.MagicMock(side_effect=mock_list_objects)
+
+        actual = [*utils.enumerate_remote_paths(mock_client, None, None, '/remote/path', 2)]
+        expected = [*mock_root_directory, *mock_sub_directory_1, *mock_sub_directory_2]
+
+        assert actual == expected
+
+    def test_excluded_subtrees_are_not_listed(self, mocker: MockFixture):
+        def mock_list_objects(path):
+            if path == '/remote/path':
+                return [
+                    WorkspaceFileInfo('/remote/path/file-1', NOTEBOOK, '1'),
+                    WorkspaceFileInfo('/remote/path/archive', DIRECTORY, '2')
+                ]
+            return [WorkspaceFileInfo(f'{path}/nested', DIRECTORY, '3')]
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_objects = mocker.MagicMock(side_effect=mock_list_objects)
+
+        actual = [*utils.enumerate_remote_paths(mock_client, ['/remote/path/archive/*'], None, '/remote/path')]
+
+        assert [x.path for x in actual] == ['/remote/path/file-1', '/remote/path/archive']
+        mock_client.list_objects.assert_called_once_with('/remote/path')
+
+    def test_list_objects_calls_saved_by_pruning(self, mocker: MockFixture):
+        """Lists a synthetic workspace holding one active project and a large archive, and
+        counts the listing calls made with and without an exclude rule for the archive."""
+
+        def build_tree(root, depth, fan_out):
+            tree = {root: []}
+            for i in range(fan_out):
+                tree[root].append(WorkspaceFileInfo(f'{root}/notebook-{i}', NOTEBOOK, '0'))
+                if depth > 0:
+                    child = f'{root}/folder-{i}'
+                    tree[root].append(WorkspaceFileInfo(child, DIRECTORY, '0'))
+                    tree.update(build_tree(child, depth - 1, fan_out))
+            return tree
+
+        tree = {
+            '/Shared': [
+                WorkspaceFileInfo('/Shared/project', DIRECTORY, '0'),
+                WorkspaceFileInfo('/Shared/archive', DIRECTORY, '0')
+            ],
+            **build_tree('/Shared/project', 1, 3),
+            **build_tree('/Shared/archive', 3, 4)
+        }
+
+        def count_list_objects(exclude, include):
+            mock_client = mocker.MagicMock()
+            mock_client.list_objects = mocker.MagicMock(side_effect=lambda path: tree.get(path, []))
+            actual = [*utils.enumerate_remote_paths(mock_client, exclude, include, '/Shared')]
+            return mock_client.list_objects.call_count, actual
+
+        unpruned_calls, _ = count_list_objects(None, None)
+        excluded_calls, excluded = count_list_objects(['/Shared/archive/*'], None)
+        included_calls, included = count_list_objects(None, ['/Shared/project/*'])
+
+        assert unpruned_calls == len(tree)
+        assert excluded_calls == 1 + 4
+        assert included_calls == 1 + 4
+        assert not [x for x in excluded if x.path.startswith('/Shared/archive/')]
+        assert not [x for x in included if x.path.startswith('/Shared/archive')]
+
+class TestExportDirectory:
+    @staticmethod
+    def _archive(files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, content in files.items():
+                archive.writestr(name, content)
+        return {'content': base64.b64encode(buffer.getvalue()).decode()}
+
+    def test_when_the_archive_is_nested_in_the_directory_name(self, mocker: MockFixture):
+        mock_client = mocker.MagicMock()
+        mock_client.client.export_workspace.return_value = self._archive({
+            'notebooks/foo.py': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            'notebooks/directory/bar.scala': '// bar',
+            'notebooks/directory/': '',
+        })
+
+        actual = utils.export_directory(mock_client, '/path/notebooks')
+
+        assert actual == {
+            '/path/notebooks/foo': data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK,
+            '/path/notebooks/directory/bar': '// bar',
+        }
+        mock_client.client.export_workspace.assert_called_once_with('/path/notebooks', 'SOURCE')
+
+    def test_when_the_only_child_shares_the_directory_name(self, mocker: MockFixture):
+        mock_client = mocker.MagicMock()
+        mock_client.client.export_workspace.return_value = self._archive({
+            'x/x/foo.py': '# foo',
+            'x/readme.txt': 'not a notebook',
+        })
+
+        actual = utils.export_directory(mock_client, '/a/x')
+
+        assert actual == {'/a/x/x/foo': '# foo'}
+
 class TestFilterJobs:
     def test_when_exclude_and_include_are_not_supplied(self):
         assert utils.filter_jobs(None, None, 'job name')
@@ -252,6 +450,48 @@ class TestFilterJobs:
     def test_when_include_is_supplied_and_there_is_a_match(self):
         assert utils.filter_jobs(None, ['job*'], 'job name')
 
+class TestFilterJobsByOwner:
+    def test_owners_are_resolved_concurrently_and_in_order(self, mocker: MockFixture):
+        jobs = [{'job_id': str(i), 'creator_user_name': 'creator@company.com'} for i in range(4)]
+
+        # All four lookups must be in flight at once for the barrier to release.
+        barrier = threading.Barrier(4, timeout=5)
+        mock_get_job_owner = mocker.patch('pipeline_deploy.databricks.utils.get_job_owner')
+        def _mock_get_job_owner(client, job_id):
+            barrier.wait()
+            return 'owner@company.com' if job_id in ('1', '3') else 'not_owner@company.com'
+        mock_get_job_owner.side_effect = _mock_get_job_owner
+
+        actual = [*utils.filter_jobs_by_owner(None, jobs, 'owner@company.com', concurrency=4)]
+
+        assert actual == [jobs[1], jobs[3]]
+
+    def test_lookups_are_submitted_as_the_jobs_arrive(self, mocker: MockFixture):
+        mock_get_job_owner = mocker.patch('pipeline_deploy.databricks.utils.get_job_owner')
+        mock_get_job_owner.return_value = 'owner@company.com'
+        consumed = []
+
+        def _jobs():
+            for i in range(10):
+                consumed.append(i)
+                yield {'job_id': str(i)}
+
+        actual = utils.filter_jobs_by_owner(None, _jobs(), 'owner@company.com', concurrency=2)
+
+        assert next(actual) == {'job_id': '0'}
+        assert len(consumed) == 4
+        assert len([*actual]) == 9
+
+    def test_when_the_creator_is_trusted(self, mocker: MockFixture):
+        mock_get_job_owner = mocker.patch('pipeline_deploy.databricks.utils.get_job_owner')
+        mock_get_job_owner.return_value = 'owner@company.com'
+
+        actual = [*utils.filter_jobs_by_owner(None, data.LIST_JOBS_OWNED['jobs'],
+                                              'owner@company.com', trust_creator=True)]
+
+        assert actual == data.LIST_JOBS_OWNED['jobs'][:2]
+        mock_get_job_owner.assert_not_called()
+
 class TestFilterNotebooks:
     def test_when_exclude_and_include_are_not_supplied(self):
         assert utils.filter_notebooks(None, None, 'notebook-name')
@@ -318,6 +558,19 @@ class TestGetJobOwner:
 
         assert str(exinfo.value) == 'Owner for job 1234567 could not be found.'
 
+class TestGetJobSettingsHash:
+    def test_the_hash_ignores_server_defaults_and_the_hash_tag(self):
+        settings = {'name': 'Job 1', 'tasks': [{'task_key': 'a'}, {'task_key': 'b'}]}
+        remote = {'name': 'Job 1', 'timeout_seconds': 0, 'format': 'MULTI_TASK',
+                  'tasks': [{'task_key': 'b'}, {'task_key': 'a'}],
+                  'tags': {utils.JOB_HASH_TAG: 'stale'}}
+
+        assert utils.get_job_settings_hash(settings) == utils.get_job_settings_hash(remote)
+
+    def test_the_hash_changes_with_the_settings(self):
+        assert utils.get_job_settings_hash({'name': 'Job 1'}) != \
+            utils.get_job_settings_hash({'name': 'Job 1', 'max_retries': -1})
+
 class TestGetLocalNotebooksMap:
     def test_when_there_are_no_notebooks(self, mocker: MockFixture):
         mock_enumerate_local_notebooks = mocker.patch('pipeline_deploy.databricks.utils.enumerate_local_notebooks')
@@ -368,6 +621,18 @@ class TestGetLanguageForNotebook:
 
         assert str(ex.value) == 'Unknown extension .TXT.'
 
+class TestGetNotebookDigest:
+    def test_whitespace_changes_do_not_change_the_digest(self, tmp_path):
+        original = tmp_path / 'original.py'
+        original.write_text(data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
+        whitespace = tmp_path / 'whitespace.py'
+        whitespace.write_text(data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK_ONLY_WHITESPACES)
+        changed = tmp_path / 'changed.py'
+        changed.write_text(data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK)
+
+        assert utils.get_notebook_digest(original) == utils.get_notebook_digest(whitespace)
+        assert utils.get_notebook_digest(original) != utils.get_notebook_digest(changed)
+
 class TestGetNotebookPath:
     def test_retrieving_the_nested_notebook_path(self):
         expected = '/path/directory/notebook'
@@ -381,6 +646,25 @@ class TestGetNotebookPath:
 
         assert utils.get_notebook_path(job) == expected
 
+class TestIsFilteredDirectory:
+    def test_when_exclude_and_include_are_not_supplied(self):
+        assert not utils.is_filtered_directory(None, None, '/Shared/project')
+
+    def test_when_an_exclude_pattern_could_match_below_the_directory(self):
+        assert utils.is_filtered_directory(['/Shared/project/archive/*'], None, '/Shared/project')
+
+    def test_when_an_exclude_pattern_starts_with_a_wildcard(self):
+        assert utils.is_filtered_directory(['*.tmp'], None, '/Shared/project')
+
+    def test_when_an_exclude_pattern_is_elsewhere(self):
+        assert not utils.is_filtered_directory(['/Shared/other/*'], None, '/Shared/project')
+
+    def test_when_an_include_pattern_covers_the_directory(self):
+        assert not utils.is_filtered_directory(None, ['/Shared/*'], '/Shared/project')
+
+    def test_when_an_include_pattern_only_covers_part_of_the_directory(self):
+        assert utils.is_filtered_directory(None, ['/Shared/project/*.py'], '/Shared/project')
+
 class TestIsJobRunning:
     def test_when_there_are_no_running_jobs(self, mocker: MockFixture):
         mock_client = mocker.MagicMock()
@@ -423,46 +707,130 @@ class TestIsJobRunning:
 
         assert not utils.is_job_running(mock_client, '123456', 'job-run')
 
-class TestIsNotebookUpdated:
-    def test_when_there_are_no_changes_to_the_notebok(self, mocker: MockFixture):
-        mock_export_workspace = get_mock_export_workspace(data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK)
-        mock_client = mocker.MagicMock()
-        mock_client.export_workspace = mocker.MagicMock(side_effect=mock_export_workspace)
+class TestIsNotebookSourceUpdated:
+    def test_when_there_are_only_whitespace_changes_to_the_notebook(self):
+        local_path = os.path.join(FILE_PATH, 'foo.py')
+
+        assert not utils.is_notebook_source_updated(
+            local_path, data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK_ONLY_WHITESPACES)
+        assert utils.is_notebook_source_updated(local_path, data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK)
+
+    def test_the_comparison_stops_at_the_first_difference(self, mocker: MockFixture, tmp_path):
+        local_path = tmp_path / 'foo.py'
+        local_path.write_text('changed\n' + 'unchanged\n' * 100000)
+        remote_source = 'original\n' + 'unchanged\n' * 100000
+
+        lines_read = []
+        def mock_remove_blank_lines(lines):
+            for line in lines:
+                lines_read.append(line)
+                yield line
+        mocker.patch('pipeline_deploy.databricks.utils.remove_blank_lines',
+                     side_effect=mock_remove_blank_lines)
+
+        assert utils.is_notebook_source_updated(str(local_path), remote_source)
+        assert lines_read == ['changed\n', 'original\n']
+
+    def test_line_endings_and_trailing_whitespace_are_ignored(self, tmp_path):
+        local_path = tmp_path / 'foo.py'
+        local_path.write_bytes(b'def fn():\r\n    pass  \r\n\r\n')
+
+        assert not utils.is_notebook_source_updated(str(local_path), 'def fn():\n\n    pass')
+
+    @pytest.mark.parametrize('extension,comment', [('py', '#'), ('r', '#'), ('scala', '//'),
+                                                   ('sql', '--')])
+    def test_the_databricks_source_framing_is_ignored(self, tmp_path, extension, comment):
+        local_path = tmp_path / f'foo.{extension}'
+        local_path.write_text('first cell\n\nsecond cell\n')
+        remote_source = f'{comment} Databricks notebook source\nfirst cell\n\n' \
+                        f'{comment} COMMAND ----------\n\nsecond cell\n'
+
+        assert not utils.is_notebook_source_updated(str(local_path), remote_source)
+
+    @pytest.mark.parametrize('local_source,remote_source', [
+        # A separator moved to split the cells differently.
+        ('# Databricks notebook source\nfirst\n# COMMAND ----------\nsecond\nthird\n',
+         '# Databricks notebook source\nfirst\nsecond\n# COMMAND ----------\nthird\n'),
+        # Cells merged by removing a separator.
+        ('first\n# COMMAND ----------\nsecond\n',
+         '# Databricks notebook source\nfirst\nsecond\n'),
+    ])
+    def test_cell_separators_are_compared_when_the_local_notebook_is_framed(self, tmp_path,
+                                                                             local_source,
+                                                                             remote_source):
+        local_path = tmp_path / 'foo.py'
+        local_path.write_text(local_source)
+
+        assert utils.is_notebook_source_updated(str(local_path), remote_source)
+        assert utils.get_notebook_digest(str(local_path)) != \
+            utils.get_source_digest(remote_source, 'PYTHON', True)
+
+    def test_a_framed_notebook_matches_its_export(self, tmp_path):
+        local_path = tmp_path / 'foo.py'
+        local_path.write_text('first\n# COMMAND ----------\nsecond\n')
+        remote_source = '# Databricks notebook source\nfirst\n\n# COMMAND ----------\n\nsecond\n'
+
+        assert not utils.is_notebook_source_updated(str(local_path), remote_source)
+        assert utils.get_notebook_digest(str(local_path)) == \
+            utils.get_source_digest(remote_source, 'PYTHON', True)
+
+    def test_framing_for_another_language_is_not_ignored(self, tmp_path):
+        local_path = tmp_path / 'foo.py'
+        local_path.write_text('first cell\nsecond cell\n')
+        remote_source = 'first cell\n-- COMMAND ----------\nsecond cell\n'
+
+        assert utils.is_notebook_source_updated(str(local_path), remote_source)
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='Requires /proc/self/fd.')
+    def test_no_file_descriptors_are_leaked(self, mocker: MockFixture):
+        # Run the real client and requests stack, stubbing only the transport, so that every
+        # export response can be checked for having been read to the end and closed.
+        bodies = []
+        def mock_send(adapter, request, **kwargs):
+            body = io.BytesIO(json.dumps({
+                'content': base64.b64encode(data.EXPORT_WORKSPACE_UNCHANGED_NOTEBOOK.encode()).decode()
+            }).encode())
+            bodies.append(body)
+            return adapter.build_response(request, HTTPResponse(
+                body=body, headers={'Content-Type': 'application/json'}, status=200,
+                preload_content=False))
+        mocker.patch.object(HTTPAdapter, 'send', autospec=True, side_effect=mock_send)
+
+        client = WorkspaceClient(ApiClient(host='https://example.cloud.databricks.com', token='token'))
 
         remote_path = '/path/notebooks/foo'
         local_path = os.path.join(FILE_PATH, 'foo.py')
 
-        assert not utils.is_notebook_updated(mock_client, False, local_path, remote_path)
+        before = len(os.listdir('/proc/self/fd'))
 
-    def test_when_there_are_only_whitespace_changes_to_the_notebook(self, mocker: MockFixture):
-        mock_export_workspace = get_mock_export_workspace(data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK_ONLY_WHITESPACES)
-        mock_client = mocker.MagicMock()
-        mock_client.export_workspace = mocker.MagicMock(side_effect=mock_export_workspace)
+        for _ in range(10000):
+            assert not utils.is_notebook_source_updated(local_path, client.export_source(remote_path))
 
-        remote_path = '/path/notebooks/foo'
-        local_path = os.path.join(FILE_PATH, 'foo.py')
+        assert len(os.listdir('/proc/self/fd')) == before
+        assert len(bodies) == 10000
+        assert all(body.closed for body in bodies)
 
-        assert not utils.is_notebook_updated(mock_client, False, local_path, remote_path)
+class TestIsPrunedDirectory:
+    def test_when_exclude_and_include_are_not_supplied(self):
+        assert not utils.is_pruned_directory(None, None, '/Shared/archive')
 
-    def test_when_there_are_changes_to_the_notebook(self, mocker: MockFixture):
-        mock_export_workspace = get_mock_export_workspace(data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK)
-        mock_client = mocker.MagicMock()
-        mock_client.export_workspace = mocker.MagicMock(side_effect=mock_export_workspace)
+    def test_when_an_exclude_pattern_covers_the_directory(self):
+        assert utils.is_pruned_directory(['/Shared/archive/*'], None, '/Shared/archive')
 
-        remote_path = '/path/notebooks/foo'
-        local_path = os.path.join(FILE_PATH, 'foo.py')
+    def test_when_an_exclude_pattern_covers_a_parent_directory(self):
+        assert utils.is_pruned_directory(['/Shared/*'], None, '/Shared/archive')
 
-        assert utils.is_notebook_updated(mock_client, False, local_path, remote_path)
+    def test_when_an_exclude_pattern_only_covers_part_of_the_directory(self):
+        assert not utils.is_pruned_directory(['/Shared/archive/*.tmp'], None, '/Shared/archive')
 
-    def test_when_there_are_changes_to_the_notebook_and_the_diff_flag_is_set(self, mocker: MockFixture):
-        mock_export_workspace = get_mock_export_workspace(data.EXPORT_WORKSPACE_CHANGED_NOTEBOOK)
-        mock_client = mocker.MagicMock()
-        mock_client.export_workspace = mocker.MagicMock(side_effect=mock_export_workspace)
+    def test_when_an_include_pattern_could_match_below_the_directory(self):
+        assert not utils.is_pruned_directory(None, ['/Shared/project/*'], '/Shared')
 
-        remote_path = '/path/notebooks/foo'
-        local_path = os.path.join(FILE_PATH, 'foo.py')
+    def test_when_an_include_pattern_starts_with_a_wildcard(self):
+        assert not utils.is_pruned_directory(None, ['*foo*'], '/Shared/archive')
 
-        assert utils.is_notebook_updated(mock_client, True, local_path, remote_path)
+    def test_when_no_include_pattern_could_match_below_the_directory(self):
+        assert utils.is_pruned_directory(None, ['/Shared/project/*'], '/Shared/archive')
 
 class TestIsStreamingjob:
     def test_when_the_job_has_retries_set_to_a_limit(self):
@@ -496,6 +864,204 @@ class TestIsStreamingNotebook:
 
         assert target(job)
 
+class TestListRemoteJobs:
+    def test_when_there_is_a_single_page(self, mocker: MockFixture):
+        mock_client = mocker.MagicMock()
+        mock_client.list_jobs = mocker.MagicMock(return_value=data.LIST_JOBS_OWNED)
+
+        actual = [*utils.list_remote_jobs(mock_client)]
+
+        assert actual == data.LIST_JOBS_OWNED['jobs']
+        mock_client.list_jobs.assert_called_once_with(expand_tasks=False, offset=0, limit=25,
+                                                      version=None)
+
+    def test_when_there_are_multiple_pages(self, mocker: MockFixture):
+        jobs = [{'job_id': str(i), 'settings': {'name': f'Job {i}'}} for i in range(5)]
+
+        def mock_list_jobs(expand_tasks, offset, limit, version):
+            return {'jobs': jobs[offset:offset + limit], 'has_more': offset + limit < len(jobs)}
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_jobs = mocker.MagicMock(side_effect=mock_list_jobs)
+
+        actual = [*utils.list_remote_jobs(mock_client, True, 2, '2.1')]
+
+        assert actual == jobs
+        assert mock_client.list_jobs.call_args_list == [
+            mocker.call(expand_tasks=True, offset=0, limit=2, version='2.1'),
+            mocker.call(expand_tasks=True, offset=2, limit=2, version='2.1'),
+            mocker.call(expand_tasks=True, offset=4, limit=2, version='2.1'),
+        ]
+
+    def test_the_next_page_is_prefetched(self, mocker: MockFixture):
+        next_page_requested = threading.Event()
+
+        def mock_list_jobs(expand_tasks, offset, limit, version):
+            if offset == 0:
+                return {'jobs': [{'job_id': '1'}, {'job_id': '2'}], 'has_more': True}
+            next_page_requested.set()
+            return {'jobs': [{'job_id': '3'}], 'has_more': False}
+
+        mock_client = mocker.MagicMock()
+        mock_client.list_jobs = mocker.MagicMock(side_effect=mock_list_jobs)
+
+        jobs = utils.list_remote_jobs(mock_client, limit=2)
+
+        assert next(jobs) == {'job_id': '1'}
+        assert next_page_requested.wait(5)
+        assert [*jobs] == [{'job_id': '2'}, {'job_id': '3'}]
+
+class TestNormaliseJobSettings:
+    def test_server_defaults_are_dropped(self):
+        remote = {
+            'name': 'Job 1',
+            'email_notifications': {},
+            'format': 'MULTI_TASK',
+            'max_concurrent_runs': 1,
+            'timeout_seconds': 0,
+            'tasks': [{'task_key': 'a', 'email_notifications': {}, 'timeout_seconds': 0}]
+        }
+
+        assert utils.normalise_job_settings(remote) == {'name': 'Job 1',
+                                                        'tasks': [{'task_key': 'a'}]}
+
+    def test_values_other_than_the_defaults_are_kept(self):
+        settings = {'name': 'Job 1', 'format': 'MULTI_TASK', 'max_concurrent_runs': 2,
+                    'timeout_seconds': 60}
+
+        assert utils.normalise_job_settings(settings) == settings
+
+    def test_reordered_lists_are_sorted(self):
+        remote = {'tasks': [{'task_key': 'b', 'depends_on': [{'task_key': 'c'}, {'task_key': 'a'}]},
+                            {'task_key': 'a'}]}
+        local = {'tasks': [{'task_key': 'a'},
+                           {'task_key': 'b', 'depends_on': [{'task_key': 'a'}, {'task_key': 'c'}]}]}
+
+        assert utils.normalise_job_settings(remote) == utils.normalise_job_settings(local)
+
+    def test_with_custom_rules(self):
+        settings = {'name': 'Job 1', 'tags': {}, 'libraries': [{'jar': 'b'}, {'jar': 'a'}]}
+
+        actual = utils.normalise_job_settings(settings, {'tags': {}}, {})
+
+        assert actual == {'name': 'Job 1', 'libraries': [{'jar': 'b'}, {'jar': 'a'}]}
+
+    def test_ignored_settings_are_dropped(self):
+        settings = {'name': 'Job 1', 'tags': {utils.JOB_HASH_TAG: 'abc', 'team': 'data'}}
+
+        assert utils.normalise_job_settings(settings) == {'name': 'Job 1', 'tags': {'team': 'data'}}
+        assert utils.normalise_job_settings(settings, ignored=['name']) == {
+            'tags': {utils.JOB_HASH_TAG: 'abc', 'team': 'data'}
+        }
+
+class TestPlanArchiveImports:
+    def test_new_directories_are_grouped_beneath_the_root(self):
+        paths = ['/r/1', '/r/a/1', '/r/a/b/2', '/r/a/c/3', '/r/d/4', '/r/old/5', '/r/old/new/6',
+                 '/r/old/new/7']
+        remote_paths = {'/r/old/8'}
+
+        archives, remainder = utils.plan_archive_imports(paths, remote_paths, '/r/', 2)
+
+        assert archives == {'/r/a': ['/r/a/1', '/r/a/b/2', '/r/a/c/3'],
+                            '/r/old/new': ['/r/old/new/6', '/r/old/new/7']}
+        assert remainder == ['/r/1', '/r/d/4', '/r/old/5']
+
+    def test_when_the_root_is_the_workspace_root(self):
+        archives, remainder = utils.plan_archive_imports(['/1', '/a/1', '/a/2'], [], '/', 2)
+
+        assert archives == {'/a': ['/a/1', '/a/2']}
+        assert remainder == ['/1']
+
+    def test_when_archive_imports_are_disabled(self):
+        archives, remainder = utils.plan_archive_imports(['/r/a/1', '/r/a/2'], [], '/r', 0)
+
+        assert not archives
+        assert remainder == ['/r/a/1', '/r/a/2']
+
+class TestPlanDeletes:
+    def test_paths_within_deleted_directories_are_dropped(self):
+        directories = ['/a/old/nested', '/a/old', '/a/old/nested/deeper', '/a/other', '/a/others']
+        notebooks = ['/a/old/nested/deeper/1', '/a/old/2', '/a/others/3', '/a/keep/4', '/a/5']
+
+        directories, notebooks = utils.plan_deletes(directories, notebooks)
+
+        assert directories == ['/a/old', '/a/other', '/a/others']
+        assert notebooks == ['/a/5', '/a/keep/4']
+
+class TestPlanDirectoryExports:
+    def test_notebooks_are_grouped_by_their_topmost_small_enough_directory(self):
+        remote_notebooks = {
+            '/a/small/1', '/a/small/2', '/a/small/nested/3',
+            '/a/large/1', '/a/large/2', '/a/large/3',
+            '/a/single/1', '/a/single/2',
+            '/a/top',
+        }
+        paths = ['/a/small/1', '/a/small/nested/3', '/a/large/1', '/a/large/2', '/a/single/1', '/a/top']
+
+        exports, remainder = utils.plan_directory_exports(paths, remote_notebooks, '/a', 3)
+
+        assert exports == {
+            '/a/small': ['/a/small/1', '/a/small/nested/3'],
+            '/a/large': ['/a/large/1', '/a/large/2'],
+        }
+        assert remainder == ['/a/single/1', '/a/top']
+
+    def test_directories_that_may_hold_filtered_out_objects_are_never_exported(self):
+        remote_notebooks = {'/a/b/1', '/a/b/2', '/a/b/c/3', '/a/b/c/4'}
+
+        exports, remainder = utils.plan_directory_exports(sorted(remote_notebooks), remote_notebooks,
+                                                          '/a', exclude=['/a/b/old/*'])
+
+        assert exports == {'/a/b/c': ['/a/b/c/3', '/a/b/c/4']}
+        assert remainder == ['/a/b/1', '/a/b/2']
+
+    def test_directories_above_the_root_are_never_exported(self):
+        remote_notebooks = {'/a/1', '/a/b/2'}
+
+        exports, remainder = utils.plan_directory_exports(['/a/1', '/a/b/2'], remote_notebooks, '/a/')
+
+        assert exports == {'/a': ['/a/1', '/a/b/2']}
+        assert not remainder
+
+    def test_when_the_root_is_the_workspace_root(self):
+        remote_notebooks = {'/a/1', '/b/2', '/c/3', '/c/4'}
+
+        exports, remainder = utils.plan_directory_exports(sorted(remote_notebooks),
+                                                          remote_notebooks, '/')
+
+        assert exports == {'/c': ['/c/3', '/c/4']}
+        assert remainder == ['/a/1', '/b/2']
+
+class TestPlanMkdirs:
+    def test_only_the_deepest_missing_directories_are_created(self):
+        paths = ['/a/new/1', '/a/new/2', '/a/new/deep/3', '/a/new/deep/er/4', '/a/other/5']
+
+        assert utils.plan_mkdirs(paths, []) == ['/a/new/deep/er', '/a/other']
+
+    def test_existing_directories_are_not_created(self):
+        paths = ['/a/1', '/a/b/2', '/a/c/3', '/a/c/d/4']
+        remote_paths = {'/a/b', '/a/c/d/notebook'}
+
+        assert utils.plan_mkdirs(paths, remote_paths) == []
+
+    def test_when_some_directories_are_missing(self):
+        paths = ['/a/b/1', '/a/b/new/2', '/a/c/3']
+        remote_paths = {'/a/b'}
+
+        assert utils.plan_mkdirs(paths, remote_paths) == ['/a/b/new', '/a/c']
+
+class TestPrintJobDiff:
+    def test_changes_are_printed_one_per_line(self, caplog):
+        changes = [('max_retries', utils.MISSING, -1), ('tasks[1].new_cluster.num_workers', 4, 8)]
+
+        with caplog.at_level(logging.INFO):
+            utils.print_job_diff('Job 1', changes)
+
+        assert caplog.records[0].getMessage().splitlines()[1:] == [
+            'max_retries: <missing> -> -1',
+            'tasks[1].new_cluster.num_workers: 4 -> 8'
+        ]
+
 class TestRestartJob:
     def test_when_the_job_is_not_running(self, mocker: MockFixture):
         mock_runs_client = mocker.MagicMock()
@@ -662,6 +1228,17 @@ class TestSetJobPermissions:
         mock_client.perform_query.assert_any_call('GET', '/permissions/jobs/123456')
         mock_client.perform_query.assert_called_with('PUT', '/permissions/jobs/123456', expected)
 
+class TestTagJobSettings:
+    def test_existing_tags_are_kept(self):
+        settings = {'name': 'Job 1', 'tags': {'team': 'data'}}
+
+        actual = utils.tag_job_settings(settings)
+
+        assert actual == {'name': 'Job 1', 'tags': {
+            'team': 'data', utils.JOB_HASH_TAG: utils.get_job_settings_hash(settings)
+        }}
+        assert settings == {'name': 'Job 1', 'tags': {'team': 'data'}}
+
 class TestStartJob:
     def test_invoking_the_client_call(self, mocker: MockFixture):
         mock_client = mocker.MagicMock()
@@ -1,24 +0,0 @@
-"""
-Copyright 2022 Comcast Cable Communications Management, LLC
-
-Licensed under the Apache License, Version 2.0 (the "License");
-you may not use this file except in compliance with the License.
-You may obtain a copy of the License at
-
-http://www.apache.org/licenses/LICENSE-2.0
-
-Unless required by applicable law or agreed to in writing, software
-distributed under the License is distributed on an "AS IS" BASIS,
-WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
-See the License for the specific language governing permissions and
-limitations under the License.
-
-SPDX-License-Identifier: Apache-2.0
-"""
-
-def get_mock_export_workspace(content):
-    def mock_export_workspace(source_path, target_path, fmt, is_overwrite, header=None):
-        with open(target_path, 'w+' if is_overwrite else 'x') as file:
-            file.write(content)
-
-    return mock_export_workspace
\ No newline at end of file